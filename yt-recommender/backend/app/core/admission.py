@@ -0,0 +1,87 @@
+import logging
+import math
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.core import metrics
+from app.core.coalesce import SingleFlight
+from app.services.mongo_client import (
+    count_pending_jobs, reserve_user_job_slot, set_user_active_jobs, user_exists,
+)
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Queue depth is read at most once per TTL per process, however many submits arrive
+_queue_depth = TTLCache(maxsize=1, ttl=settings.admission_queue_depth_ttl_seconds)
+_queue_depth_reads = SingleFlight()
+
+
+class AdmissionRejected(Exception):
+    """A submission was refused; the client should retry after retry_after seconds."""
+
+    def __init__(self, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+def _retry_after(seconds: float) -> int:
+    return max(1, min(math.ceil(seconds), settings.admission_max_retry_after_seconds))
+
+
+async def get_queue_depth() -> int:
+    """Number of pending jobs, cached for a short time."""
+    depth = _queue_depth.get("depth")
+    if depth is None:
+        depth = await _queue_depth_reads.do("depth", count_pending_jobs)
+        _queue_depth.set("depth", depth)
+    return depth
+
+
+async def check_queue_depth():
+    """
+    Refuse new work while the queue is over its limit. Retry-After is the
+    estimated time for workers to drain the excess.
+    """
+    depth = await get_queue_depth()
+    if depth < settings.admission_max_queue_depth:
+        return
+
+    metrics.incr("admission.rejected_queue")
+    excess = depth - settings.admission_max_queue_depth + 1
+    drain_seconds = excess * settings.admission_avg_job_seconds / max(settings.worker_concurrency, 1)
+    raise AdmissionRejected("Too many jobs queued, please retry later", _retry_after(drain_seconds))
+
+
+async def reserve_user_slot(email: str) -> Optional[Dict[str, Any]]:
+    """
+    Count a new job against the user's active job limit.
+
+    Returns the user's {"plan"} if a slot was reserved (release it when the
+    job ends) and None for submitters without an account, who are not
+    tracked. Raises AdmissionRejected when the user already has the maximum
+    active jobs.
+    """
+    limit = settings.admission_max_active_jobs_per_user
+    user = await reserve_user_job_slot(email, limit)
+    if user is not None:
+        return user
+    if not await user_exists(email):
+        return None
+
+    # The counter can drift (crashed workers, jobs from before it was
+    # maintained); recount from the jobs themselves before refusing
+    active = await count_pending_jobs(email)
+    if active < limit:
+        logger.info("Correcting active_jobs for %s to %d", email, active)
+        await set_user_active_jobs(email, active)
+        user = await reserve_user_job_slot(email, limit)
+        if user is not None:
+            return user
+
+    metrics.incr("admission.rejected_user")
+    raise AdmissionRejected(
+        f"You already have {limit} jobs in progress, please wait for one to finish",
+        _retry_after(settings.admission_avg_job_seconds),
+    )
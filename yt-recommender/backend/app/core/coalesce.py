@@ -0,0 +1,227 @@
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from app.core.config import settings
+from app.core import metrics
+from app.core.errors import DeferredError
+from app.services.mongo_client import (
+    acquire_analysis_lock, get_analysis_lock, complete_analysis_lock, release_analysis_lock,
+    renew_analysis_lock, save_analysis_lock_progress,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Shares one execution of an async function among concurrent callers
+    that use the same key within this process.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._inflight.get(key)
+        if future is not None:
+            metrics.incr("singleflight.shared")
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        # Avoid "exception was never retrieved" when nobody else was waiting
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            # The owner gave up (e.g. hit its job deadline); the callers that
+            # were sharing its run retry it rather than being cancelled too
+            future.set_exception(DeferredError("Shared run was cancelled", retry_after=1))
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+
+
+_analyses = SingleFlight()
+
+ServiceCallback = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+class _Progress:
+    """
+    Service results of one shared run, handed to every job sharing it
+    (a late joiner first gets the results so far).
+    """
+
+    def __init__(self):
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.listeners: List[ServiceCallback] = []
+        self.callers = 0
+
+    async def listen(self, listener: ServiceCallback):
+        self.listeners.append(listener)
+        for name, result in list(self.results.items()):
+            await self._deliver(listener, name, result)
+
+    async def publish(self, name: str, result: Dict[str, Any]):
+        self.results[name] = result
+        for listener in list(self.listeners):
+            await self._deliver(listener, name, result)
+
+    @staticmethod
+    async def _deliver(listener: ServiceCallback, name: str, result: Dict[str, Any]):
+        try:
+            await listener(name, result)
+        except Exception as e:
+            logger.warning("Service callback failed for %s: %s", name, e)
+
+
+_progress: Dict[str, _Progress] = {}
+
+
+def analysis_key(
+    channel_id: str,
+    services: List[str],
+    videos: List[Dict[str, Any]],
+    fresh: bool = False,
+) -> str:
+    """
+    Key identifying an analysis: the channel, the selected services and the
+    snapshot of videos being analysed. Runs that must not reuse an earlier
+    result (bypassCache) only coalesce with each other.
+    """
+    snapshot = {
+        "channel_id": channel_id,
+        "services": sorted(services or []),
+        "videos": [[v.get("video_id"), v.get("title")] for v in videos],
+        "fresh": fresh,
+    }
+    payload = json.dumps(snapshot, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+Analysis = Tuple[Dict[str, Any], bool]
+
+
+async def run_coalesced(
+    key: str,
+    fn: Callable[[ServiceCallback], Awaitable[Analysis]],
+    fresh: bool = False,
+    on_service: Optional[ServiceCallback] = None,
+) -> Analysis:
+    """
+    Run fn once for all identical concurrent analyses, both within this
+    process and across worker processes. fn is called with a service
+    callback and returns (report, complete); every caller's on_service
+    receives the services of the shared run as they finish, so each job
+    has partial results to fall back on. With fresh, a result another
+    process already finished is never reused.
+    """
+    progress = _progress.setdefault(key, _Progress())
+    progress.callers += 1
+    try:
+        if on_service is not None:
+            await progress.listen(on_service)
+        return await _analyses.do(key, lambda: _run_with_lock(key, fn, fresh, progress))
+    finally:
+        if on_service in progress.listeners:
+            progress.listeners.remove(on_service)
+        progress.callers -= 1
+        if not progress.callers:
+            del _progress[key]
+
+
+async def _run_with_lock(
+    key: str,
+    fn: Callable[[ServiceCallback], Awaitable[Analysis]],
+    fresh: bool,
+    progress: _Progress,
+) -> Analysis:
+    """
+    Cross-process coordination through a lock document in analysis_locks:
+    the owner runs fn, records each finished service on the lock and
+    publishes a complete result there just long enough for the waiting
+    processes to pick it up (the analysis cache is what serves later
+    requests). The owner keeps extending the lock while fn runs. The others
+    follow the services and wait for the result, or take over if the owner
+    disappears or its report was incomplete.
+    """
+    owner = uuid4().hex
+
+    while True:
+        try:
+            acquired = await acquire_analysis_lock(
+                key, owner, settings.analysis_lock_ttl_seconds, take_finished=fresh,
+            )
+        except Exception as e:
+            logger.warning("Analysis lock unavailable, running uncoordinated: %s", e)
+            return await fn(progress.publish)
+
+        if acquired:
+            break
+
+        lock = await get_analysis_lock(key)
+        if lock and "result" in lock and not fresh:
+            metrics.incr("singleflight.shared_remote")
+            return lock["result"], True
+
+        for name, result in ((lock or {}).get("partial") or {}).items():
+            if progress.results.get(name) != result:
+                await progress.publish(name, result)
+
+        await asyncio.sleep(settings.analysis_lock_poll_interval)
+
+    async def on_service(name: str, result: Dict[str, Any]):
+        await progress.publish(name, result)
+        try:
+            await save_analysis_lock_progress(key, owner, name, result)
+        except Exception as e:
+            logger.warning("Failed to share analysis progress: %s", e)
+
+    renewal = asyncio.create_task(_renew_lock(key, owner))
+    try:
+        result, complete = await fn(on_service)
+    except BaseException:
+        try:
+            await release_analysis_lock(key, owner)
+        except Exception as e:
+            logger.warning("Failed to release analysis lock: %s", e)
+        raise
+    finally:
+        renewal.cancel()
+
+    try:
+        if complete:
+            await complete_analysis_lock(key, owner, result, settings.analysis_result_ttl_seconds)
+        else:
+            # Don't hand fallback content to other jobs: let them run their own
+            await release_analysis_lock(key, owner)
+    except Exception as e:
+        logger.warning("Failed to publish coalesced analysis result: %s", e)
+
+    return result, complete
+
+
+async def _renew_lock(key: str, owner: str):
+    """Keep extending an analysis lock while its owner is still running."""
+    interval = max(settings.analysis_lock_ttl_seconds / 3, 1)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            still_owned = await renew_analysis_lock(key, owner, settings.analysis_lock_ttl_seconds)
+        except Exception as e:
+            logger.warning("Failed to renew analysis lock: %s", e)
+            continue
+        if not still_owned:
+            logger.warning("Lost analysis lock %s", key)
+            return
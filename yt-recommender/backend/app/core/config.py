@@ -4,6 +4,32 @@ import os
 class Settings(BaseSettings):
     youtube_api_key: str = os.getenv("YOUTUBE_API_KEY")
     gemini_api_key: str = os.getenv("GEMINI_API_KEY")
+    gemini_model: str = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+    gemini_max_concurrency: int = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+    gemini_max_connections: int = int(os.getenv("GEMINI_MAX_CONNECTIONS", "16"))
+    gemini_timeout_seconds: int = int(os.getenv("GEMINI_TIMEOUT_SECONDS", "120"))
+    # Retries with jittered backoff, circuit breaker and AIMD concurrency
+    # (between GEMINI_MIN_CONCURRENCY and GEMINI_MAX_CONCURRENCY)
+    gemini_max_attempts: int = int(os.getenv("GEMINI_MAX_ATTEMPTS", "4"))
+    gemini_backoff_base_seconds: float = float(os.getenv("GEMINI_BACKOFF_BASE_SECONDS", "1.0"))
+    gemini_backoff_max_seconds: float = float(os.getenv("GEMINI_BACKOFF_MAX_SECONDS", "30"))
+    gemini_min_concurrency: int = int(os.getenv("GEMINI_MIN_CONCURRENCY", "1"))
+    gemini_breaker_failure_threshold: int = int(os.getenv("GEMINI_BREAKER_FAILURE_THRESHOLD", "5"))
+    gemini_breaker_cooldown_seconds: int = int(os.getenv("GEMINI_BREAKER_COOLDOWN_SECONDS", "60"))
+    # Hedging: repeat a (non-streamed) call still running after this latency
+    # percentile, for at most GEMINI_HEDGE_BUDGET of all calls. Streamed calls
+    # are never hedged: with GEMINI_STREAMING on, the combined call is not
+    # covered, only per-service calls and re-asks
+    gemini_hedging: bool = os.getenv("GEMINI_HEDGING", "false").lower() == "true"
+    gemini_hedge_percentile: float = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "95"))
+    gemini_hedge_budget: float = float(os.getenv("GEMINI_HEDGE_BUDGET", "0.05"))
+    gemini_hedge_min_delay_seconds: float = float(os.getenv("GEMINI_HEDGE_MIN_DELAY_SECONDS", "2.0"))
+    # "combined" (one prompt for all services) or "per_service" (parallel fan-out)
+    gemini_analysis_mode: str = os.getenv("GEMINI_ANALYSIS_MODE", "combined")
+    # Stream combined-mode responses and persist each service as it completes;
+    # without it a combined analysis cut off by the job deadline has nothing
+    # to complete partially with (but the combined call can be hedged)
+    gemini_streaming: bool = os.getenv("GEMINI_STREAMING", "true").lower() == "true"
     mongodb_uri: str = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
     database_name: str = "yt_recommender"
     
@@ -29,6 +55,61 @@ class Settings(BaseSettings):
     # Application
     frontend_url: str = os.getenv("FRONTEND_URL", "http://localhost:5173")
     environment: str = os.getenv("ENVIRONMENT", "development")
+
+    # Job queue / worker
+    worker_concurrency: int = int(os.getenv("WORKER_CONCURRENCY", "4"))
+    worker_poll_interval: float = float(os.getenv("WORKER_POLL_INTERVAL", "2.0"))
+    job_lease_seconds: int = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+    job_max_attempts: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    worker_metrics_interval: int = int(os.getenv("WORKER_METRICS_INTERVAL", "300"))
+    job_deadline_seconds: int = int(os.getenv("JOB_DEADLINE_SECONDS", "600"))
+
+    # Job scheduling across plans (weighted fair queuing) and users
+    scheduler_plan_weights: str = os.getenv("SCHEDULER_PLAN_WEIGHTS", "free:1,pro:3,team:6")
+    scheduler_max_running_per_user: int = int(os.getenv("SCHEDULER_MAX_RUNNING_PER_USER", "2"))
+    scheduler_max_wait_seconds: int = int(os.getenv("SCHEDULER_MAX_WAIT_SECONDS", "600"))
+
+    # Admission control on /submit
+    admission_max_queue_depth: int = int(os.getenv("ADMISSION_MAX_QUEUE_DEPTH", "500"))
+    admission_max_active_jobs_per_user: int = int(os.getenv("ADMISSION_MAX_ACTIVE_JOBS_PER_USER", "3"))
+    admission_queue_depth_ttl_seconds: float = float(os.getenv("ADMISSION_QUEUE_DEPTH_TTL_SECONDS", "2.0"))
+    admission_avg_job_seconds: int = int(os.getenv("ADMISSION_AVG_JOB_SECONDS", "60"))
+    admission_max_retry_after_seconds: int = int(os.getenv("ADMISSION_MAX_RETRY_AFTER_SECONDS", "600"))
+
+    # Live job progress (SSE)
+    sse_heartbeat_seconds: int = int(os.getenv("SSE_HEARTBEAT_SECONDS", "10"))
+
+    # Caching
+    channel_cache_size: int = int(os.getenv("CHANNEL_CACHE_SIZE", "2048"))
+    channel_cache_ttl_seconds: int = int(os.getenv("CHANNEL_CACHE_TTL_SECONDS", "604800"))
+    youtube_cache_max_bytes: int = int(os.getenv("YOUTUBE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    youtube_cache_persist: bool = os.getenv("YOUTUBE_CACHE_PERSIST", "false").lower() == "true"
+    youtube_cache_ttl_seconds: int = int(os.getenv("YOUTUBE_CACHE_TTL_SECONDS", "604800"))
+    analysis_cache_size: int = int(os.getenv("ANALYSIS_CACHE_SIZE", "256"))
+    analysis_cache_ttl_seconds: int = int(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", "86400"))
+    job_cache_size: int = int(os.getenv("JOB_CACHE_SIZE", "1000"))
+    job_cache_ttl_seconds: int = int(os.getenv("JOB_CACHE_TTL_SECONDS", "300"))
+    job_cache_fallback_ttl_seconds: int = int(os.getenv("JOB_CACHE_FALLBACK_TTL_SECONDS", "2"))
+
+    # YouTube quota (units per day) and request rate shared by all workers
+    youtube_daily_quota: int = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+    youtube_quota_reserve: int = int(os.getenv("YOUTUBE_QUOTA_RESERVE", "100"))
+    youtube_rate_units_per_second: float = float(os.getenv("YOUTUBE_RATE_UNITS_PER_SECOND", "5"))
+    youtube_rate_burst: float = float(os.getenv("YOUTUBE_RATE_BURST", "200"))
+    youtube_rate_max_wait_seconds: float = float(os.getenv("YOUTUBE_RATE_MAX_WAIT_SECONDS", "30"))
+
+    # YouTube request batching
+    youtube_batch_window_ms: int = int(os.getenv("YOUTUBE_BATCH_WINDOW_MS", "25"))
+
+    # Coalescing of identical analyses
+    analysis_lock_ttl_seconds: int = int(os.getenv("ANALYSIS_LOCK_TTL_SECONDS", "300"))
+    # How long a finished run stays on its lock for processes still polling it
+    analysis_result_ttl_seconds: int = int(os.getenv("ANALYSIS_RESULT_TTL_SECONDS", "10"))
+    analysis_lock_poll_interval: float = float(os.getenv("ANALYSIS_LOCK_POLL_INTERVAL", "1.0"))
+
+    # Job payloads (videos / report) stored outside the job document
+    job_payload_compression_level: int = int(os.getenv("JOB_PAYLOAD_COMPRESSION_LEVEL", "6"))
+    job_payload_gridfs_threshold_bytes: int = int(os.getenv("JOB_PAYLOAD_GRIDFS_THRESHOLD_BYTES", str(4 * 1024 * 1024)))
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,9 @@
+class DeferredError(Exception):
+    """
+    A job cannot make progress right now but should not fail: the worker
+    puts it back in the queue to be retried after retry_after seconds.
+    """
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
@@ -0,0 +1,70 @@
+import asyncio
+from collections import defaultdict
+from typing import Any, Dict, Set
+
+# Job statuses after which no further events are published
+TERMINAL_JOB_STATUSES = {"completed", "failed"}
+
+
+class JobEventBus:
+    """
+    In-process pub/sub for job progress events.
+
+    Nothing is buffered: a process only sees its own writes (and, in the
+    API, the change stream), so a reconnecting client is sent the job's
+    current state from Mongo instead of a replay.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+
+    def has_subscribers(self, job_id: str) -> bool:
+        return job_id in self._subscribers
+
+    def publish(self, job_id: str, event_type: str, data: Dict[str, Any]):
+        event = {"event": event_type, "data": data}
+        for queue in list(self._subscribers.get(job_id, ())):
+            queue.put_nowait(event)
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        """Start receiving events for a job."""
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers[job_id].add(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(job_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[job_id]
+
+
+# Global event bus instance
+job_events = JobEventBus()
+
+
+def publish_job_update(job_id: str, update_data: Dict[str, Any]):
+    """
+    Translate a job update into progress events: a "status" event for
+    status changes and a "service" event per streamed service result.
+    Only processes with SSE clients for the job (the API) do any work.
+    """
+    if not job_events.has_subscribers(job_id):
+        return
+
+    fields = update_data.get("$set", update_data)
+
+    for key, value in fields.items():
+        if key.startswith("partial_services."):
+            job_events.publish(job_id, "service", {
+                "service": key.split(".", 1)[1],
+                "result": value,
+            })
+
+    if "status" in fields:
+        job_events.publish(job_id, "status", {
+            "status": fields["status"],
+            "error": fields.get("error"),
+        })
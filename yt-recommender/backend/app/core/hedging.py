@@ -0,0 +1,98 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, TypeVar
+
+from app.core import metrics
+
+T = TypeVar("T")
+
+
+class Hedger:
+    """
+    Hedged requests: when a call is still running after the given
+    percentile of recently observed latencies, an identical second call is
+    started and whichever succeeds first wins (the other is cancelled).
+
+    Each request earns `budget` hedge tokens and each hedge spends one, so
+    hedges stay below that fraction of all requests. Nothing is hedged
+    until min_samples latencies have been observed.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        percentile: float,
+        budget: float,
+        min_samples: int = 20,
+        min_delay_seconds: float = 0.0,
+        window: int = 200,
+    ):
+        self.name = name
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.min_delay_seconds = min_delay_seconds
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._tokens = 0.0
+        self._max_tokens = max(1.0, budget * window)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None while there is too little data."""
+        if len(self._latencies) < self.min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, math.ceil(len(ordered) * self.percentile / 100) - 1)
+        return max(self.min_delay_seconds, ordered[index])
+
+    async def run(self, request: Callable[[], Awaitable[T]]) -> T:
+        self._tokens = min(self._max_tokens, self._tokens + self.budget)
+
+        delay = self.hedge_delay()
+        primary = asyncio.ensure_future(self._timed(request, record_cancelled=True))
+        if delay is None:
+            return await primary
+
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done or self._tokens < 1:
+                return await primary
+
+            self._tokens -= 1
+            metrics.incr(f"{self.name}.hedged")
+            hedge = asyncio.ensure_future(self._timed(request))
+            return await self._first_success(primary, hedge)
+        finally:
+            primary.cancel()
+
+    async def _first_success(self, primary: asyncio.Future, hedge: asyncio.Future) -> T:
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if not task.cancelled() and task.exception() is None:
+                        if task is hedge:
+                            metrics.incr(f"{self.name}.hedge_won")
+                        return task.result()
+            # Both failed: report the original request's error
+            return primary.result()
+        finally:
+            for task in (primary, hedge):
+                task.cancel()
+
+    async def _timed(self, request: Callable[[], Awaitable[T]], record_cancelled: bool = False) -> T:
+        started = time.monotonic()
+        try:
+            result = await request()
+        except asyncio.CancelledError:
+            # A primary cancelled because its hedge won (or the caller gave
+            # up) took at least this long; leaving it out would bias the
+            # percentile towards fast calls. A cancelled hedge started late,
+            # so its time says nothing about latency.
+            if record_cancelled:
+                self._latencies.append(time.monotonic() - started)
+            raise
+        self._latencies.append(time.monotonic() - started)
+        return result
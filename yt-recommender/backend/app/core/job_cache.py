@@ -0,0 +1,143 @@
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.core.config import settings
+from app.core import metrics
+from app.core.events import publish_job_update
+from app.services.mongo_client import get_db, get_job
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Server error codes meaning change streams are not supported (standalone mongod)
+_CHANGE_STREAMS_UNSUPPORTED = {40573, 20}
+
+
+class JobStatusCache:
+    """
+    Read-through in-memory cache of job documents for an API process.
+
+    Entries are kept coherent with worker writes by a MongoDB change stream
+    on the jobs collection (resumed with its resume token after errors).
+    When change streams are unavailable, entries simply expire after a
+    short TTL instead.
+    """
+
+    def __init__(self):
+        self._cache = TTLCache(maxsize=settings.job_cache_size, ttl=settings.job_cache_ttl_seconds)
+        self._resume_token: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+        # Ids being read from Mongo -> {"readers", "generation"}; _apply bumps
+        # the generation so a read that raced with a change is not cached
+        self._reads: Dict[str, Dict[str, int]] = {}
+        self.watching = False
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._cache.get(job_id)
+        if job is not None:
+            metrics.incr("job_cache.hit")
+            return job
+
+        metrics.incr("job_cache.miss")
+        read = self._reads.setdefault(job_id, {"readers": 0, "generation": 0})
+        read["readers"] += 1
+        generation = read["generation"]
+        try:
+            job = await get_job(job_id)
+        finally:
+            read["readers"] -= 1
+            if not read["readers"]:
+                del self._reads[job_id]
+
+        if job and read["generation"] == generation:
+            ttl = None if self.watching else settings.job_cache_fallback_ttl_seconds
+            self._cache.set(job_id, job, ttl=ttl)
+        return job
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.watching = False
+
+    async def _watch(self):
+        delay = 1
+        while True:
+            try:
+                async with get_db().jobs.watch(
+                    full_document="updateLookup",
+                    resume_after=self._resume_token,
+                ) as stream:
+                    self.watching = True
+                    delay = 1
+                    logger.info("Watching jobs change stream")
+                    async for change in stream:
+                        self._resume_token = stream.resume_token
+                        self._apply(change)
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                self._stop_watching()
+                if e.code in _CHANGE_STREAMS_UNSUPPORTED:
+                    logger.info("Change streams unavailable, job cache falls back to TTL expiry")
+                    return
+                logger.warning("Jobs change stream failed: %s", e)
+                # The resume token may be too old to resume from
+                self._resume_token = None
+            except PyMongoError as e:
+                self._stop_watching()
+                logger.warning("Jobs change stream interrupted: %s", e)
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60)
+
+    def _stop_watching(self):
+        # Updates may be missed until the stream is back, so drop everything
+        self.watching = False
+        self._clear()
+
+    def _clear(self):
+        self._cache.clear()
+        for read in self._reads.values():
+            read["generation"] += 1
+
+    def _apply(self, change: Dict[str, Any]):
+        operation = change["operationType"]
+        if operation == "invalidate":
+            self._clear()
+            return
+
+        job_id = str(change["documentKey"]["_id"])
+        read = self._reads.get(job_id)
+        if read is not None:
+            read["generation"] += 1
+
+        if operation == "delete":
+            self._cache.pop(job_id)
+            return
+
+        # Only refresh jobs somebody is reading; don't fill the cache with every write
+        document = change.get("fullDocument")
+        if document is not None and self._cache.get(job_id) is not None:
+            document["_id"] = job_id
+            self._cache.set(job_id, document)
+
+        # Feed this process's event bus with updates made by worker processes
+        if operation == "update":
+            updated = change.get("updateDescription", {}).get("updatedFields", {})
+            publish_job_update(job_id, updated)
+
+
+# Global job status cache instance (started by the API lifespan)
+job_status_cache = JobStatusCache()
@@ -0,0 +1,30 @@
+from collections import defaultdict
+from typing import Dict
+
+# Process-local counters (cache hits, API calls, ...) and timings. Each API /
+# worker process keeps its own set; the worker logs a snapshot periodically.
+_counters: Dict[str, int] = defaultdict(int)
+_timings: Dict[str, Dict[str, float]] = defaultdict(lambda: {"count": 0, "total": 0.0, "max": 0.0})
+
+
+def incr(name: str, value: int = 1):
+    """Increment a named counter."""
+    _counters[name] += value
+
+
+def observe(name: str, seconds: float):
+    """Record a duration for a named timing."""
+    timing = _timings[name]
+    timing["count"] += 1
+    timing["total"] += seconds
+    timing["max"] = max(timing["max"], seconds)
+
+
+def snapshot() -> Dict[str, float]:
+    """Return a flat copy of all counters and timing summaries."""
+    result: Dict[str, float] = dict(_counters)
+    for name, timing in _timings.items():
+        result[f"{name}.count"] = timing["count"]
+        result[f"{name}.avg_ms"] = round(timing["total"] / timing["count"] * 1000, 1)
+        result[f"{name}.max_ms"] = round(timing["max"] * 1000, 1)
+    return result
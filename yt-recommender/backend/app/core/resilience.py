@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timezone
+
+from app.core import metrics
+from app.core.errors import DeferredError
+from app.services.mongo_client import get_circuit_open_until, open_circuit
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(DeferredError):
+    """Calls to a dependency are suspended after sustained failures."""
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter for the given retry (1-based)."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit adjusted by AIMD: it grows by about one slot per
+    window of successful calls and halves when the provider throttles us
+    (at most once per second, so one burst of 429s counts once).
+
+    Use as `async with limiter:` around each call.
+    """
+
+    def __init__(self, name: str, initial: int, minimum: int, maximum: int):
+        self.name = name
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(initial)
+        self._in_flight = 0
+        self._condition = asyncio.Condition()
+        self._last_decrease = 0.0
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < int(self.limit))
+            self._in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        if self.limit < self.maximum:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def on_throttle(self):
+        now = time.monotonic()
+        if now - self._last_decrease < 1:
+            return
+        self._last_decrease = now
+        self.limit = max(self.minimum, self.limit / 2)
+        metrics.incr(f"{self.name}.limit_decreased")
+        logger.info("%s concurrency limit lowered to %d", self.name, int(self.limit))
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing dependency for cooldown_seconds after
+    failure_threshold consecutive failures, then lets a single probe call
+    through (half-open) to decide whether to close again.
+
+    Trips are written to the circuit_breakers collection so every worker
+    process backs off together; the shared state is re-read at most every
+    sync_seconds and ignored if Mongo is unavailable.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, cooldown_seconds: float, sync_seconds: float = 5.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.sync_seconds = sync_seconds
+        self._failures = 0
+        self._open_until = 0.0
+        self._probing = False
+        self._synced_at = 0.0
+
+    async def check(self):
+        """Raise CircuitOpenError unless a call may be made now."""
+        now = time.time()
+        await self._sync(now)
+
+        if now < self._open_until:
+            metrics.incr(f"{self.name}.circuit_rejected")
+            raise CircuitOpenError(f"{self.name} circuit open", self._open_until - now)
+
+        if self._open_until:
+            # Half-open: one probe at a time
+            if self._probing:
+                raise CircuitOpenError(f"{self.name} circuit half-open", self.cooldown_seconds / 4)
+            self._probing = True
+
+    def release_probe(self):
+        """Let another probe through after one ended without an outcome (cancelled)."""
+        self._probing = False
+
+    async def record_success(self):
+        self._failures = 0
+        if self._open_until:
+            logger.info("%s circuit closed", self.name)
+        self._open_until = 0.0
+        self._probing = False
+
+    async def record_failure(self):
+        self._failures += 1
+        if self._probing or self._failures >= self.failure_threshold:
+            await self._trip()
+
+    async def _trip(self):
+        self._open_until = time.time() + self.cooldown_seconds
+        self._probing = False
+        self._failures = 0
+        metrics.incr(f"{self.name}.circuit_opened")
+        logger.warning("%s circuit opened for %.0fs", self.name, self.cooldown_seconds)
+        try:
+            await open_circuit(self.name, datetime.fromtimestamp(self._open_until, timezone.utc))
+        except Exception as e:
+            logger.warning("Failed to share %s circuit state: %s", self.name, e)
+
+    async def _sync(self, now: float):
+        if now - self._synced_at < self.sync_seconds:
+            return
+        self._synced_at = now
+        try:
+            shared = await get_circuit_open_until(self.name)
+        except Exception as e:
+            logger.warning("Failed to read %s circuit state: %s", self.name, e)
+            return
+        if shared is None:
+            return
+        shared_until = shared.timestamp()
+        if shared_until > max(self._open_until, now):
+            self._open_until = shared_until
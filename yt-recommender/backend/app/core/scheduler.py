@@ -0,0 +1,123 @@
+import asyncio
+import itertools
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.core import metrics
+from app.services.mongo_client import (
+    get_runnable_job_heads, count_running_jobs_per_user, claim_job,
+)
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+def parse_plan_weights(value: str) -> Dict[str, float]:
+    """Parse "free:1,pro:3,team:6" into {"free": 1.0, "pro": 3.0, "team": 6.0}."""
+    weights = {}
+    for item in value.split(","):
+        plan, _, weight = item.partition(":")
+        if plan.strip() and weight.strip():
+            weights[plan.strip()] = float(weight)
+    return weights
+
+
+class FairScheduler:
+    """
+    Picks the next job for this worker process.
+
+    - Plans share the workers by weighted fair queuing: each plan has a
+      virtual time advanced by 1/weight per dispatched job and the backlogged
+      plan with the lowest virtual time goes next.
+    - Within a plan, users take turns (least recently served first).
+    - Users already running max_running_per_user jobs are skipped.
+    - A job waiting longer than max_wait_seconds goes first regardless, so
+      low-weight plans cannot starve.
+
+    Selection works on the oldest runnable job per (plan, user) and the
+    chosen job is claimed by _id, so several processes can schedule safely.
+    """
+
+    def __init__(
+        self,
+        weights: Dict[str, float],
+        max_running_per_user: int,
+        max_wait_seconds: int,
+    ):
+        self.weights = weights
+        self.max_running_per_user = max_running_per_user
+        self.max_wait_seconds = max_wait_seconds
+        self._virtual_time: Dict[str, float] = {}
+        self._backlogged: Set[str] = set()
+        self._turns = itertools.count()
+        self._last_served = TTLCache(maxsize=10000, ttl=3600)
+        self._lock = asyncio.Lock()
+
+    async def claim_next(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Claim the next job according to the policy, or None if nothing is runnable."""
+        # One selection at a time per process, so loops don't pick the same head
+        async with self._lock:
+            heads = await get_runnable_job_heads()
+            if not heads:
+                return None
+
+            running = await count_running_jobs_per_user()
+            eligible = [
+                head for head in heads
+                if running.get(head["email"], 0) < self.max_running_per_user
+            ]
+
+            while eligible:
+                head = self._pick(eligible)
+                job = await claim_job(head["job_id"], worker_id, settings.job_lease_seconds)
+                if job:
+                    self._record(head)
+                    return job
+                # Claimed by another process in the meantime
+                eligible.remove(head)
+
+            return None
+
+    def _weight(self, plan: str) -> float:
+        return self.weights.get(plan, 1.0)
+
+    def _pick(self, eligible: List[Dict[str, Any]]) -> Dict[str, Any]:
+        now = datetime.now(timezone.utc)
+        starving = [
+            head for head in eligible
+            if (now - head["created_at"]).total_seconds() >= self.max_wait_seconds
+        ]
+        if starving:
+            metrics.incr("scheduler.starvation_override")
+            return min(starving, key=lambda head: head["created_at"])
+
+        plans = {head["plan"] for head in eligible}
+        # A plan that was idle starts at the current minimum instead of
+        # cashing in the turns it did not use
+        floor = min((self._virtual_time[p] for p in self._backlogged & plans), default=0.0)
+        for plan in plans - self._backlogged:
+            self._virtual_time[plan] = max(self._virtual_time.get(plan, 0.0), floor)
+        self._backlogged = plans
+
+        plan = min(plans, key=lambda p: (self._virtual_time[p], -self._weight(p)))
+        candidates = [head for head in eligible if head["plan"] == plan]
+        return min(
+            candidates,
+            key=lambda head: (self._last_served.get(head["email"], -1), head["created_at"]),
+        )
+
+    def _record(self, head: Dict[str, Any]):
+        plan = head["plan"]
+        self._virtual_time[plan] = self._virtual_time.get(plan, 0.0) + 1 / self._weight(plan)
+        self._last_served.set(head["email"], next(self._turns))
+        metrics.incr(f"scheduler.dispatched.{plan}")
+
+
+# Shared by all worker loops of this process
+scheduler = FairScheduler(
+    weights=parse_plan_weights(settings.scheduler_plan_weights),
+    max_running_per_user=settings.scheduler_max_running_per_user,
+    max_wait_seconds=settings.scheduler_max_wait_seconds,
+)
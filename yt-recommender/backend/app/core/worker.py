@@ -1,51 +1,187 @@
 import asyncio
-from app.services.youtube import resolve_channel, fetch_latest_videos
-from app.services.ai import analyse
-from app.services.mongo_client import create_job, get_job, update_job
+import argparse
+import os
+import signal
+import socket
+import time
+from app.core.config import settings
+from app.core import metrics
+from app.core.coalesce import analysis_key, run_coalesced
+from app.core.errors import DeferredError
+from app.core.events import TERMINAL_JOB_STATUSES
+from app.core.scheduler import scheduler
+from app.services.youtube import resolve_channel, fetch_latest_videos, close_http_client
+from app.services.ai import analyse, warm_gemini_client, close_gemini_client
+from app.services.mongo_client import (
+    create_job, get_job, update_job, heartbeat_job, release_job, close_client,
+    save_job_payload, load_job_payload, get_job_fields, release_user_job_slot, defer_job,
+)
+from app.db.indexes import ensure_indexes
 from uuid import uuid4
 from app.services.email import send_email
 from app.schemas.schemas import JobStatusResponse
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Share of the job deadline each stage may use; time a stage leaves unused
+# carries over to the stages after it
+STAGE_SHARES = {"resolve": 0.1, "fetch": 0.2, "analyse": 0.6, "email": 0.1}
+
+
+class JobDeadline:
+    """Splits the time left until a job's deadline among its remaining stages."""
+
+    def __init__(self, deadline_at: datetime):
+        self.deadline_at = deadline_at
+
+    def remaining(self) -> float:
+        return max(0.0, (self.deadline_at - datetime.now(timezone.utc)).total_seconds())
+
+    def stage_timeout(self, stage: str) -> float:
+        stages = list(STAGE_SHARES)
+        pending = stages[stages.index(stage):]
+        return self.remaining() * STAGE_SHARES[stage] / sum(STAGE_SHARES[s] for s in pending)
+
+
+def _partial_result_writer(job_id: str):
+    """
+    Build a callback that persists each service result on the job as soon as
+    it is available and tracks time-to-first-insight.
+    Returns (callback, results received so far).
+    """
+    started = time.monotonic()
+    first = True
+    results = {}
+
+    async def on_service(name: str, result: dict):
+        nonlocal first
+        results[name] = result
+        now = datetime.now(timezone.utc)
+        update = {f"partial_services.{name}": result, "updated_at": now}
+        if first:
+            first = False
+            metrics.observe("analysis.time_to_first_insight", time.monotonic() - started)
+            update["first_insight_at"] = now
+        await update_job(job_id, update)
+
+    return on_service, results
+
+
 async def process_job(job_id: str):
     job = await get_job(job_id)
     if not job:
         return
 
+    # Stages already persisted on the job act as checkpoints: a job re-claimed
+    # after a crash or redeploy resumes at the first unfinished stage instead
+    # of re-spending YouTube quota.
+    status = job.get("status")
+    channel_id = job.get("channel_id")
+    videos = None
+    if status == "videos_fetched":
+        videos = await load_job_payload(job["videos_ref"]) if job.get("videos_ref") else job.get("videos")
+
+    if status != "queued":
+        logger.info("Resuming job %s from checkpoint '%s'", job_id, status)
+
+    # The deadline survives crashes and re-claims, so a job cannot run forever
+    deadline_at = job.get("deadline_at")
+    if deadline_at is None:
+        deadline_at = datetime.now(timezone.utc) + timedelta(seconds=settings.job_deadline_seconds)
+        await update_job(job_id, {"deadline_at": deadline_at})
+    deadline = JobDeadline(deadline_at)
+
     # Step 1: Resolve channel
-    try:
-        channel_id = await resolve_channel(job["channel_name"])
-        await update_job(job_id, {
-            "channel_id": channel_id,
-            "status": "channel_resolved",
-            "updated_at": datetime.now(timezone.utc),
-        })
-    except Exception as e:
-        await update_job(job_id, {"status": "failed", "error": str(e)})
-        return
+    if not channel_id:
+        try:
+            channel_id = await asyncio.wait_for(
+                resolve_channel(job["channel_name"]),
+                timeout=deadline.stage_timeout("resolve"),
+            )
+            await update_job(job_id, {
+                "channel_id": channel_id,
+                "status": "channel_resolved",
+                "updated_at": datetime.now(timezone.utc),
+            })
+        except DeferredError:
+            raise
+        except asyncio.TimeoutError:
+            await update_job(job_id, {"status": "failed", "error": "Timed out resolving the channel on YouTube"})
+            return
+        except Exception as e:
+            await update_job(job_id, {"status": "failed", "error": str(e)})
+            return
 
     # Step 2: Fetch videos
-    try:
-        videos = await fetch_latest_videos(channel_id)
-        await update_job(job_id, {"videos": videos, "status": "videos_fetched"})
-    except Exception as e:
-        await update_job(job_id, {"status": "failed", "error": str(e)})
-        return
+    if status != "videos_fetched" or videos is None:
+        try:
+            videos = await asyncio.wait_for(
+                fetch_latest_videos(channel_id),
+                timeout=deadline.stage_timeout("fetch"),
+            )
+            videos_ref = await save_job_payload(job_id, "videos", videos)
+            await update_job(job_id, {
+                "videos_ref": videos_ref,
+                "video_count": len(videos),
+                "status": "videos_fetched",
+            })
+        except DeferredError:
+            raise
+        except asyncio.TimeoutError:
+            await update_job(job_id, {"status": "failed", "error": "Timed out fetching channel data from YouTube"})
+            return
+        except Exception as e:
+            await update_job(job_id, {"status": "failed", "error": str(e)})
+            return
 
     # Step 3: AI analysis
     try:
-        job = await get_job(job_id)
         services = job.get("services", [])
-        report = await analyse(videos, services=services)
+        on_service, finished = _partial_result_writer(job_id)
+        partial = False
+        bypass_cache = job.get("bypass_cache", False)
+        try:
+            # Identical concurrent jobs share a single analysis run
+            report, _ = await asyncio.wait_for(
+                run_coalesced(
+                    analysis_key(channel_id, services, videos, fresh=bypass_cache),
+                    lambda notify: analyse(
+                        videos,
+                        services=services,
+                        use_cache=not bypass_cache,
+                        on_service=notify,
+                    ),
+                    fresh=bypass_cache,
+                    on_service=on_service,
+                ),
+                timeout=deadline.stage_timeout("analyse"),
+            )
+        except asyncio.TimeoutError:
+            # Out of time: deliver the services that made it (including any
+            # streamed before a re-claim) rather than nothing
+            services_done = {**(job.get("partial_services") or {}), **finished}
+            if not services_done:
+                raise RuntimeError("AI analysis timed out")
+            logger.warning("Job %s hit its deadline, completing with %d service(s)", job_id, len(services_done))
+            metrics.incr("jobs.partial")
+            report = {"services": services_done}
+            partial = True
 
+        ai_report_ref = await save_job_payload(job_id, "ai_report", report)
         await update_job(job_id, {
-            "ai_report": report,
-            "status": "completed"
+            "$set": {
+                "ai_report_ref": ai_report_ref,
+                "status": "completed",
+                "partial": partial,
+                "updated_at": datetime.now(timezone.utc),
+            },
+            "$unset": {"partial_services": ""},
         })
+    except DeferredError:
+        raise
     except Exception as e:
         await update_job(job_id, {"status": "failed", "error": str(e)})
         return
@@ -80,12 +216,177 @@ async def process_job(job_id: str):
                     if cta:
                         email_body += f"\n\n{cta}"
 
-                await asyncio.to_thread(
-                    send_email,
-                    to_email=job["email"],
-                    subject="Your AI Analysis Report by TubeIntelligence is here!",
-                    body=email_body
+                # The report is already saved; give the email at least a few seconds
+                await asyncio.wait_for(
+                    asyncio.to_thread(
+                        send_email,
+                        to_email=job["email"],
+                        subject="Your AI Analysis Report by TubeIntelligence is here!",
+                        body=email_body
+                    ),
+                    timeout=max(deadline.stage_timeout("email"), 5),
                 )
     except Exception as e:
             print(f"Failed to send email: {e}")  # Log this properly in real apps
             logger.error("Failed to send email", exc_info=e)
+
+
+# ============================================================================
+# WORKER RUNTIME
+# ============================================================================
+
+async def _heartbeat(job_id: str, worker_id: str):
+    """
+    Keep extending the job lease while the job is being processed.
+    Returns once the lease has been lost to another worker.
+    """
+    interval = max(settings.job_lease_seconds / 3, 1)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            still_owned = await heartbeat_job(job_id, worker_id, settings.job_lease_seconds)
+        except Exception as e:
+            logger.warning("Heartbeat failed for job %s: %s", job_id, e)
+            continue
+        if not still_owned:
+            logger.warning("Worker %s lost lease on job %s", worker_id, job_id)
+            return
+
+
+async def run_claimed_job(job: dict, worker_id: str):
+    """Process a claimed job while holding its lease."""
+    job_id = job["_id"]
+
+    if job.get("attempts", 1) > settings.job_max_attempts:
+        await update_job(job_id, {
+            "status": "failed",
+            "error": f"Gave up after {settings.job_max_attempts} attempts",
+            "updated_at": datetime.now(timezone.utc),
+        })
+        await release_job(job_id, worker_id)
+        await _release_user_slot(job)
+        return
+
+    heartbeat = asyncio.create_task(_heartbeat(job_id, worker_id))
+    processing = asyncio.create_task(process_job(job_id))
+    try:
+        await asyncio.wait({processing, heartbeat}, return_when=asyncio.FIRST_COMPLETED)
+        if not processing.done():
+            # The job was re-claimed: stop so it is not processed (and paid
+            # for, and emailed) twice. The new owner releases the user's slot.
+            processing.cancel()
+            await asyncio.gather(processing, return_exceptions=True)
+            metrics.incr("jobs.lease_lost")
+            return
+        await processing
+    except DeferredError as e:
+        # Completed stages are checkpointed; the job resumes from there later
+        not_before = datetime.now(timezone.utc) + timedelta(seconds=e.retry_after)
+        logger.info("Deferring job %s until %s: %s", job_id, not_before.isoformat(), e)
+        metrics.incr("jobs.deferred")
+        await defer_job(job_id, worker_id, not_before, str(e))
+    except Exception as e:
+        logger.error("Unhandled error while processing job %s", job_id, exc_info=e)
+    finally:
+        heartbeat.cancel()
+        processing.cancel()
+        await release_job(job_id, worker_id)
+
+    current = await get_job_fields(job_id, ["status"])
+    if current and current.get("status") in TERMINAL_JOB_STATUSES:
+        await _release_user_slot(job)
+
+
+async def _release_user_slot(job: dict):
+    """Give the job's active slot back to its user (admission control)."""
+    try:
+        await release_user_job_slot(job["email"])
+    except Exception as e:
+        logger.warning("Failed to release active job slot for job %s: %s", job["_id"], e)
+
+
+async def worker_loop(worker_id: str, stop: asyncio.Event):
+    """Claim and process jobs one at a time until asked to stop."""
+    while not stop.is_set():
+        try:
+            job = await scheduler.claim_next(worker_id)
+        except Exception as e:
+            logger.error("Failed to claim job", exc_info=e)
+            job = None
+
+        if job is None:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=settings.worker_poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        logger.info("Worker %s claimed job %s", worker_id, job["_id"])
+        try:
+            await run_claimed_job(job, worker_id)
+        except Exception as e:
+            # e.g. Mongo unreachable while releasing: the lease expires and
+            # the job is re-claimed, so keep this loop alive
+            logger.error("Failed to finish job %s", job["_id"], exc_info=e)
+
+
+async def _log_metrics(stop: asyncio.Event):
+    """Periodically log this process's counters."""
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.worker_metrics_interval)
+        except asyncio.TimeoutError:
+            pass
+        logger.info("Worker metrics: %s", metrics.snapshot())
+
+
+async def run_worker(concurrency: int):
+    """
+    Run `concurrency` worker loops in this process until SIGINT/SIGTERM.
+    In-flight jobs are finished before shutdown; anything left behind is
+    re-claimed by another worker once its lease expires.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass  # Windows
+
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info("Starting %d worker loop(s) as %s", concurrency, prefix)
+
+    try:
+        await ensure_indexes()
+    except Exception as e:
+        logger.warning("Could not create indexes: %s", e)
+    await warm_gemini_client()
+
+    try:
+        await asyncio.gather(
+            _log_metrics(stop),
+            *[worker_loop(f"{prefix}:{i}", stop) for i in range(concurrency)],
+        )
+    finally:
+        await close_gemini_client()
+        await close_http_client()
+        await close_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TubeIntelligence analysis job worker")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.worker_concurrency,
+        help="Number of jobs processed concurrently by this process",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(run_worker(args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
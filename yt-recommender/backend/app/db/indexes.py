@@ -0,0 +1,73 @@
+import logging
+import time
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import PyMongoError
+
+from app.models.models import (
+    USER_COLLECTION, JOB_COLLECTION, CHANNEL_ALIAS_COLLECTION, YOUTUBE_RESPONSE_COLLECTION,
+    ANALYSIS_LOCK_COLLECTION, ANALYSIS_CACHE_COLLECTION, YOUTUBE_QUOTA_COLLECTION,
+)
+from app.services.mongo_client import get_db
+
+logger = logging.getLogger(__name__)
+
+
+def _ttl() -> IndexModel:
+    """Expire documents at their expires_at time (default name, as created by older releases)."""
+    return IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0)
+
+
+# Indexes per collection; creating an existing index is a no-op.
+INDEXES: Dict[str, List[IndexModel]] = {
+    USER_COLLECTION: [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+    ],
+    JOB_COLLECTION: [
+        # A user's jobs, newest first (keyset pagination on _id)
+        IndexModel(
+            [("email", ASCENDING), ("_id", DESCENDING)],
+            name="email_id",
+        ),
+        # Client retries of a submission (Idempotency-Key header) map to one job
+        IndexModel(
+            [("email", ASCENDING), ("idempotency_key", ASCENDING)],
+            name="email_idempotency_key",
+            unique=True,
+            partialFilterExpression={"idempotency_key": {"$type": "string"}},
+        ),
+        # Queue claims: pending jobs whose lease is missing or expired
+        IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)], name="status_lease"),
+    ],
+    CHANNEL_ALIAS_COLLECTION: [_ttl()],
+    YOUTUBE_RESPONSE_COLLECTION: [_ttl()],
+    ANALYSIS_LOCK_COLLECTION: [_ttl()],
+    ANALYSIS_CACHE_COLLECTION: [_ttl()],
+    YOUTUBE_QUOTA_COLLECTION: [_ttl()],
+}
+
+
+async def ensure_indexes():
+    """
+    Creates all application indexes (idempotent) and logs how long each
+    collection took. A failing collection (e.g. duplicate emails blocking a
+    unique index) is logged and does not prevent startup.
+    """
+    db = get_db()
+    started = time.monotonic()
+
+    for collection, indexes in INDEXES.items():
+        collection_started = time.monotonic()
+        try:
+            await db[collection].create_indexes(indexes)
+        except PyMongoError as e:
+            logger.error("Failed to create indexes on %s: %s", collection, e)
+            continue
+        logger.info(
+            "Indexes ready on %s in %.0f ms",
+            collection, (time.monotonic() - collection_started) * 1000,
+        )
+
+    logger.info("Index bootstrap finished in %.0f ms", (time.monotonic() - started) * 1000)
@@ -1,12 +1,26 @@
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 from app.core.config import settings
 
+from app.core.job_cache import job_status_cache
+from app.db.indexes import ensure_indexes
+from app.services.mongo_client import close_client
 from app.routes import job, auth, test_db
 
-app = FastAPI(title="YT Recommender Backend")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ensure_indexes()
+    job_status_cache.start()
+    yield
+    await job_status_cache.stop()
+    await close_client()
+
+
+app = FastAPI(title="YT Recommender Backend", lifespan=lifespan)
 
 FRONTEND_URL = settings.frontend_url
 SESSION_SECRET = settings.jwt_secret_key or "dev-secret-key"
@@ -5,7 +5,17 @@ from datetime import datetime
 # Collection names
 USER_COLLECTION = "users"
 JOB_COLLECTION = "jobs"
+CHANNEL_ALIAS_COLLECTION = "channel_aliases"
+YOUTUBE_RESPONSE_COLLECTION = "youtube_responses"
+ANALYSIS_LOCK_COLLECTION = "analysis_locks"
+ANALYSIS_CACHE_COLLECTION = "analysis_cache"
+YOUTUBE_QUOTA_COLLECTION = "youtube_quota"
+RATE_LIMIT_COLLECTION = "rate_limits"
+CIRCUIT_BREAKER_COLLECTION = "circuit_breakers"
+JOB_PAYLOAD_COLLECTION = "job_payloads"
 
+# Job statuses a worker may still pick up from the queue
+PENDING_JOB_STATUSES = ["queued", "channel_resolved", "videos_fetched"]
 
 
 class JobDocument(BaseModel):
@@ -14,10 +24,31 @@ class JobDocument(BaseModel):
     channel_name: Optional[str] = None
     channel_id: Optional[str] = None
     services: List[str] = []
+    bypass_cache: bool = False
+    plan: str = "free"  # submitter's plan at submit time, used by the worker scheduler
+    idempotency_key: Optional[str] = None  # from the submit request's Idempotency-Key header
     status: str = "queued"
     error: Optional[str] = None
-    videos: Optional[List[Dict[str, Any]]] = None
-    ai_report: Optional[str] = None
+    # Large payloads live in job_payloads; the job only keeps references
+    videos_ref: Optional[str] = None
+    video_count: Optional[int] = None
+    ai_report_ref: Optional[str] = None
+    partial_services: Optional[Dict[str, Any]] = None  # service results streamed in before completion
+    first_insight_at: Optional[datetime] = None
+
+    # Queue lease (set while a worker owns the job)
+    lease_owner: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+    attempts: int = 0
+
+    # Deferred (e.g. YouTube quota exhausted): not claimable before this time
+    not_before: Optional[datetime] = None
+    deferred_reason: Optional[str] = None
+
+    # Set when processing starts; stages are cancelled once it passes
+    deadline_at: Optional[datetime] = None
+    partial: bool = False  # completed at the deadline with only some services
+
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -51,8 +82,6 @@ class UserDocument(BaseModel):
     credits_used: int = 0
     credits_limit: int = 100
 
-    job_ids: List[str] = []
-
     is_active: bool = True
     is_verified: bool = False
 
@@ -60,7 +60,6 @@ async def register(user_data: UserRegister):
         "plan": "free",
         "credits_used": 0,
         "credits_limit": 100,
-        "job_ids": [],
         "is_active": True,
         "is_verified": False,
         "created_at": datetime.utcnow(),
@@ -447,7 +446,6 @@ async def google_callback(request: Request):
                 "plan": "free",
                 "credits_used": 0,
                 "credits_limit": 100,
-                "job_ids": [],
                 "is_active": True,
                 "is_verified": True,  # Google users are auto-verified
                 "created_at": datetime.utcnow(),
@@ -1,53 +1,283 @@
-from fastapi import APIRouter, BackgroundTasks, HTTPException
+import asyncio
+import base64
+import hashlib
+import json
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import Optional
 from uuid import uuid4
-from app.schemas.schemas import SubmitRequest, JobStatusResponse
-from app.services.mongo_client import create_job, get_job, update_job, get_user_by_email, update_user
-from app.core.worker import process_job
+from datetime import datetime, timezone
+from app.core.config import settings
+from app.core.events import job_events, TERMINAL_JOB_STATUSES
+from app.core.job_cache import job_status_cache
+from app.schemas.schemas import SubmitRequest, JobStatusResponse, JobStatusSummary, JobHistoryResponse
+from app.services.mongo_client import (
+    create_job_once, find_job_by_idempotency_key, get_job_fields, load_job_payload,
+    list_jobs_by_email, release_user_job_slot,
+)
+from app.core.admission import AdmissionRejected, check_queue_depth, reserve_user_slot
+from app.utils.auth import get_current_user
 
 router = APIRouter(tags=["Submit Job"])
 
 @router.post("/submit", response_model=dict, status_code=202)
-async def submit_job(request: SubmitRequest, background: BackgroundTasks):
+async def submit_job(
+    request: SubmitRequest,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+):
+    # Admission control: refuse work while the queue or the user is at capacity
+    try:
+        await check_queue_depth()
+        user = await reserve_user_slot(request.email)
+        reserved = user is not None
+    except AdmissionRejected as e:
+        # A retry of a submission that was already accepted is still answered
+        existing_id = None
+        if idempotency_key:
+            existing_id = await find_job_by_idempotency_key(request.email, idempotency_key)
+        if existing_id:
+            return {"jobId": existing_id}
+        raise HTTPException(status_code=429, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to create job: {str(e)}")
+
     # Create initial job document
     try:
+        now = datetime.now(timezone.utc)
         job_doc = {
             "email": request.email,
             "channel_name": request.channelName,
             "services": request.services,
+            "bypass_cache": request.bypassCache,
+            # Scheduling weight; submitters without an account run as free
+            "plan": (user or {}).get("plan", "free"),
             "status": "queued",
-            "created_at": None,
-            "updated_at": None,
+            "created_at": now,
+            "updated_at": now,
         }
-        job_id = await create_job(job_doc)
-        
-        # Update user's job counters
-        user = await get_user_by_email(request.email)
-        if user:
-            await update_user(user["_id"], {
-                "$inc": {"total_jobs": 1, "active_jobs": 1},
-                "$push": {"job_ids": job_id}
-            })
-        
-        # Kick off background processing
-        background.add_task(process_job, job_id)
-        return {"jobId": job_id}
+        if idempotency_key:
+            job_doc["idempotency_key"] = idempotency_key
+        job_id, created = await create_job_once(job_doc)
     except Exception as e:
+        if reserved:
+            await release_user_job_slot(request.email, count_job=True)
         raise HTTPException(status_code=500, detail=f"Failed to create job: {str(e)}")
 
+    # A retried key returns the existing job without counting it twice
+    if not created and reserved:
+        await release_user_job_slot(request.email, count_job=True)
+
+    # The job is now queued; a worker process (python -m app.core.worker) picks it up
+    return {"jobId": job_id}
+
+
+def _encode_cursor(job: dict) -> str:
+    return base64.urlsafe_b64encode(str(job["_id"]).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> ObjectId:
+    """Turn an opaque page cursor back into the job _id it points at."""
+    try:
+        return ObjectId(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/jobs", response_model=JobHistoryResponse)
+async def list_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    user: dict = Depends(get_current_user),
+):
+    """
+    The current user's job history, newest first, one page at a time.
+    """
+    before = _decode_cursor(cursor) if cursor else None
+    jobs = await list_jobs_by_email(
+        user["email"],
+        limit,
+        before=before,
+        fields=["status", "error", "channel_id", "channel_name", "services",
+                "video_count", "created_at", "updated_at"],
+    )
+
+    return {
+        "jobs": [
+            {
+                "jobId": job["_id"],
+                "status": job.get("status"),
+                "error": job.get("error"),
+                "channelId": job.get("channel_id"),
+                "channelName": job.get("channel_name"),
+                "services": job.get("services", []),
+                "videoCount": job.get("video_count"),
+                "createdAt": job.get("created_at") or ObjectId(job["_id"]).generation_time,
+                "updatedAt": job.get("updated_at"),
+            }
+            for job in jobs
+        ],
+        "nextCursor": _encode_cursor(jobs[-1]) if len(jobs) == limit else None,
+    }
+
+
+def _job_etag(job: dict) -> Optional[str]:
+    """Strong ETag for a job, derived from its updated_at timestamp."""
+    updated_at = job.get("updated_at")
+    if not updated_at:
+        return None
+    digest = hashlib.sha1(f"{job['_id']}:{updated_at.isoformat()}".encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    if not if_none_match or not etag:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+async def _load_payload(job: dict, field: str):
+    """Load a job payload by its reference (older jobs keep it inline)."""
+    ref = job.get(f"{field}_ref")
+    if ref:
+        return await load_job_payload(ref)
+    return job.get(field)
+
+
 @router.get("/job/{job_id}", response_model=JobStatusResponse)
-async def get_job_status(job_id: str):
+async def get_job_status(
+    job_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+):
     try:
-        job = await get_job(job_id)
+        job = await job_status_cache.get(job_id)
         if not job:
             raise HTTPException(status_code=404, detail="Job not found")
+
+        # Unchanged since the client's last poll: skip serialising the report
+        etag = _job_etag(job)
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+        if etag:
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = "no-cache"
+
+        videos, ai_report = await asyncio.gather(
+            _load_payload(job, "videos"),
+            _load_payload(job, "ai_report"),
+        )
+
         return {
             "jobId": job_id,
             "status": job.get("status"),
             "error": job.get("error"),
             "channelId": job.get("channel_id"),
             "channelName": job.get("channel_name"),
-            "videos": job.get("videos"),
-            "aiReport": job.get("ai_report"),
+            "videos": videos,
+            "aiReport": ai_report,
+            "partialServices": job.get("partial_services"),
+            "partial": job.get("partial", False),
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get job status: {str(e)}")
+
+
+@router.get("/job/{job_id}/status", response_model=JobStatusSummary)
+async def get_job_status_summary(
+    job_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Status-only view of a job for polling; loads just the needed fields.
+    """
+    try:
+        job = await get_job_fields(job_id, ["status", "error", "channel_id", "channel_name", "updated_at"])
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+
+        etag = _job_etag(job)
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+        if etag:
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = "no-cache"
+
+        return {
+            "jobId": job_id,
+            "status": job.get("status"),
+            "error": job.get("error"),
+            "channelId": job.get("channel_id"),
+            "channelName": job.get("channel_name"),
+            "updatedAt": job.get("updated_at"),
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get job status: {str(e)}")
+
+
+def _sse(event_type: str, data: dict) -> str:
+    """Format a Server-Sent Event."""
+    return f"event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.get("/job/{job_id}/events")
+async def job_events_stream(job_id: str, request: Request):
+    """
+    Stream job progress as Server-Sent Events: "status" events on status
+    transitions and "service" events as individual service results arrive.
+    Every (re)connection starts with the job's current state. The stream
+    ends once the job is completed or failed.
+    """
+    # Subscribe before reading the snapshot so no update falls in between
+    queue = job_events.subscribe(job_id)
+    try:
+        job = await get_job_fields(job_id, ["status", "error", "partial_services"])
+    except BaseException:
+        job_events.unsubscribe(job_id, queue)
+        raise
+    if not job:
+        job_events.unsubscribe(job_id, queue)
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream():
+        status = job.get("status")
+        try:
+            # Current state first, so clients never miss what happened before connecting
+            for name, result in (job.get("partial_services") or {}).items():
+                yield _sse("service", {"service": name, "result": result})
+            yield _sse("status", {"status": status, "error": job.get("error")})
+
+            while status not in TERMINAL_JOB_STATUSES:
+                if await request.is_disconnected():
+                    return
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=settings.sse_heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    # Without the change stream, updates published by worker
+                    # processes never reach this bus: re-sync from a projected read
+                    if job_status_cache.watching:
+                        continue
+                    current = await get_job_fields(job_id, ["status", "error"])
+                    if current and current.get("status") != status:
+                        status = current.get("status")
+                        yield _sse("status", {"status": status, "error": current.get("error")})
+                    continue
+
+                if event["event"] == "status":
+                    status = event["data"]["status"]
+                yield _sse(event["event"], event["data"])
+        finally:
+            job_events.unsubscribe(job_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,10 +1,12 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal
+from datetime import datetime
 
 class SubmitRequest(BaseModel):
     email: EmailStr = Field(..., description="User email address")
     channelName: str = Field(..., description="YouTube channel name or handle")
     services: List[str] = Field(default_factory=list, description="Optional list of extra services")
+    bypassCache: bool = Field(False, description="Force a fresh AI analysis instead of reusing a cached one")
 
 class VideoInfo(BaseModel):
     title: str
@@ -19,6 +21,35 @@ class JobStatusResponse(BaseModel):
     channel_id: Optional[str] = None
     videos: Optional[List[VideoInfo]] = None
     aiReport: Optional[Dict[str, Any]] = None  # Changed from str to Dict to support structured analysis
+    partialServices: Optional[Dict[str, Any]] = None  # Service results available before completion
+    partial: bool = False  # Report completed at the job deadline with only some services
+
+
+class JobStatusSummary(BaseModel):
+    """Lightweight job status for polling (no videos or report)"""
+    jobId: str
+    status: str
+    error: Optional[str] = None
+    channelId: Optional[str] = None
+    channelName: Optional[str] = None
+    updatedAt: Optional[datetime] = None
+
+
+class JobHistoryItem(BaseModel):
+    jobId: str
+    status: str
+    error: Optional[str] = None
+    channelId: Optional[str] = None
+    channelName: Optional[str] = None
+    services: List[str] = []
+    videoCount: Optional[int] = None
+    createdAt: Optional[datetime] = None
+    updatedAt: Optional[datetime] = None
+
+
+class JobHistoryResponse(BaseModel):
+    jobs: List[JobHistoryItem]
+    nextCursor: Optional[str] = None  # Pass back as ?cursor= for the next page; None on the last page
 
 
 # Authentication Schemas
@@ -119,8 +150,15 @@ class PlatformAnalysis(BaseModel):
     optimization_tips: List[str] = Field(..., description="Optimization tips")
 
 
+class PlatformBreakdown(BaseModel):
+    youtube: PlatformAnalysis
+    x_twitter: PlatformAnalysis
+    linkedin: PlatformAnalysis
+
+
 class MultiPlatformMastery(BaseModel):
-    platforms: Dict[str, PlatformAnalysis] = Field(
+    # Fixed keys rather than a free-form dict, so it can be used as a Gemini response schema
+    platforms: PlatformBreakdown = Field(
         ..., 
         description="Platform analyses (youtube, x_twitter, linkedin)"
     )
@@ -128,7 +166,7 @@ class MultiPlatformMastery(BaseModel):
 
 # Copyright Protection Schemas
 class CopyrightProtection(BaseModel):
-    risk_level: str = Field(..., pattern="^(LOW|MEDIUM|HIGH)$", description="Risk level: LOW, MEDIUM, or HIGH")
+    risk_level: Literal["LOW", "MEDIUM", "HIGH"] = Field(..., description="Risk level: LOW, MEDIUM, or HIGH")
     flags: List[str] = Field(..., description="Copyright flags")
     assessment: str = Field(..., description="Detailed assessment")
     recommendations: List[str] = Field(..., description="Recommendations")
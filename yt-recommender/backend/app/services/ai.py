@@ -1,8 +1,28 @@
+import asyncio
+import functools
 import json
+import hashlib
+import logging
+import httpx
 from google import genai
+from google.genai import errors as genai_errors
 from google.genai import types
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple, Callable, Awaitable, TypeVar, Type, Union
+from pydantic import BaseModel, TypeAdapter, ValidationError, create_model
 from app.core.config import settings
+from app.core import metrics
+from app.core.errors import DeferredError
+from app.core.hedging import Hedger
+from app.core.resilience import AdaptiveLimiter, CircuitBreaker, backoff_delay
+from app.schemas.schemas import (
+    SemanticTitleEngine, PredictiveCTRAnalysis, MultiPlatformMastery,
+    CopyrightProtection, FairUseAnalysis, TrendIntelligence, EmailSummary,
+)
+from app.services.mongo_client import get_cached_analysis, save_cached_analysis
+from app.utils.cache import TTLCache
+from app.utils.json_stream import JSONObjectStreamParser
+
+logger = logging.getLogger(__name__)
 
 
 # Service ID to name mapping
@@ -15,8 +35,117 @@ SERVICE_MAP = {
     "10": "trend_intelligence"
 }
 
+# Response model for each service (used to describe per-service output)
+SERVICE_MODELS = {
+    "semantic_title_engine": SemanticTitleEngine,
+    "predictive_ctr_analysis": PredictiveCTRAnalysis,
+    "multi_platform_mastery": MultiPlatformMastery,
+    "copyright_protection": CopyrightProtection,
+    "fair_use_analysis": FairUseAnalysis,
+    "trend_intelligence": TrendIntelligence,
+}
+
+SERVICE_SCHEMAS = {
+    name: json.dumps(model.model_json_schema(), indent=2)
+    for name, model in SERVICE_MODELS.items()
+}
+EMAIL_SUMMARY_SCHEMA = json.dumps(EmailSummary.model_json_schema(), indent=2)
+
+# Pre-built validators for Gemini output
+SERVICE_ADAPTERS = {name: TypeAdapter(model) for name, model in SERVICE_MODELS.items()}
+EMAIL_SUMMARY_ADAPTER = TypeAdapter(EmailSummary)
+
+# Callback invoked with (service_name, result) as soon as a service completes
+ServiceCallback = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+SYSTEM_INSTRUCTION = "You are an expert YouTube content strategist. Always respond with valid JSON only."
+
+# Shared Gemini client (singleton)
+_gemini_client: Optional[genai.Client] = None
+
+# Caps concurrent Gemini calls in this process; the cap adapts to throttling
+_gemini_limiter = AdaptiveLimiter(
+    "gemini",
+    initial=settings.gemini_max_concurrency,
+    minimum=settings.gemini_min_concurrency,
+    maximum=settings.gemini_max_concurrency,
+)
+
+# Suspends Gemini calls (and defers jobs) while the API keeps failing
+_gemini_breaker = CircuitBreaker(
+    "gemini",
+    failure_threshold=settings.gemini_breaker_failure_threshold,
+    cooldown_seconds=settings.gemini_breaker_cooldown_seconds,
+)
+
+# Repeats slow calls to cut tail latency (GEMINI_HEDGING)
+_gemini_hedger = Hedger(
+    "gemini",
+    percentile=settings.gemini_hedge_percentile,
+    budget=settings.gemini_hedge_budget,
+    min_delay_seconds=settings.gemini_hedge_min_delay_seconds,
+)
+
+# HTTP statuses worth retrying: throttling and transient server errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+T = TypeVar("T")
+
+# In-process tier of the analysis result cache (Mongo analysis_cache is shared)
+_analysis_cache = TTLCache(
+    maxsize=settings.analysis_cache_size,
+    ttl=settings.analysis_cache_ttl_seconds,
+)
+
+
+def get_gemini_client() -> genai.Client:
+    """
+    Returns a shared Gemini client so HTTP connections and TLS sessions are
+    reused across jobs instead of being re-created per call.
+    """
+    global _gemini_client
+    if _gemini_client is None:
+        _gemini_client = genai.Client(
+            api_key=settings.gemini_api_key,
+            http_options=types.HttpOptions(
+                timeout=settings.gemini_timeout_seconds * 1000,  # milliseconds
+                async_client_args={
+                    "limits": httpx.Limits(
+                        max_connections=settings.gemini_max_connections,
+                        max_keepalive_connections=settings.gemini_max_connections,
+                    ),
+                },
+            ),
+        )
+    return _gemini_client
+
+
+async def warm_gemini_client():
+    """
+    Create the Gemini client and open a connection ahead of the first job.
+    """
+    if not settings.gemini_api_key:
+        return
+    try:
+        await get_gemini_client().aio.models.get(model=settings.gemini_model)
+    except Exception as e:
+        logger.warning("Gemini warm-up failed: %s", e)
+
+
+async def close_gemini_client():
+    global _gemini_client
+    if _gemini_client:
+        await _gemini_client.aio.aclose()
+        _gemini_client = None
+
 
-async def analyse(videos: List[Dict[str, Any]], channel_stats: Dict[str, Any] = None, services: List[str] = None) -> Dict[str, Any]:
+async def analyse(
+    videos: List[Dict[str, Any]],
+    channel_stats: Dict[str, Any] = None,
+    services: List[str] = None,
+    use_cache: bool = True,
+    on_service: Optional[ServiceCallback] = None,
+) -> Tuple[Dict[str, Any], bool]:
     """
     Analyze YouTube videos using Gemini-2.5-flash with service-specific analysis.
     
@@ -24,27 +153,113 @@ async def analyse(videos: List[Dict[str, Any]], channel_stats: Dict[str, Any] =
         videos: List of video dictionaries with title, description, url, statistics
         channel_stats: Optional channel statistics
         services: List of service IDs selected by user
+        use_cache: Reuse a cached result for identical inputs (a fresh
+            result is cached either way)
+        on_service: Optional callback receiving each service result as soon
+            as it is available (streaming / per-service modes)
         
     Returns:
-        Dictionary with service-specific analysis results
+        (report, complete) where complete is False if any part of the
+        report is fallback content
     """
     if not settings.gemini_api_key:
-        return get_fallback_analysis(videos, services)
-    
+        return get_fallback_analysis(videos, services), False
+
+    cache_key = analysis_cache_key(videos, services)
+    if use_cache:
+        cached = await _get_cached_result(cache_key)
+        if cached is not None:
+            return cached, True
+    else:
+        metrics.incr("analysis_cache.bypass")
+
     try:
-        return await call_gemini_api(videos, channel_stats, services)
+        if settings.gemini_analysis_mode == "per_service" and services:
+            result, complete = await call_gemini_per_service(videos, services, on_service)
+        else:
+            result, complete = await call_gemini_api(videos, channel_stats, services, on_service)
+    except DeferredError:
+        # Gemini is unavailable for now: retry the job later rather than
+        # handing out the canned fallback
+        raise
     except Exception as e:
         print(f"Gemini API failed, using fallback: {str(e)}")
-        return get_fallback_analysis(videos, services)
+        return get_fallback_analysis(videos, services), False
 
+    # Reports with per-service fallbacks are returned but not cached
+    if complete:
+        await _store_result(cache_key, result)
+    return result, complete
 
-async def call_gemini_api(videos: List[Dict[str, Any]], channel_stats: Dict[str, Any] = None, services: List[str] = None) -> Dict[str, Any]:
-    """Call Gemini API with service-specific prompts."""
-    
-    # Build video details for prompt (take last 3 videos)
+
+def _stats_bucket(value: Any) -> Optional[str]:
+    """Round a statistic to 2 significant digits so small drifts share a key."""
+    try:
+        return f"{float(value):.2g}"
+    except (TypeError, ValueError):
+        return None
+
+
+def analysis_cache_key(videos: List[Dict[str, Any]], services: List[str] = None) -> str:
+    """
+    Content hash of everything that goes into the Gemini prompt: the
+    analysed videos, bucketed statistics, selected services and model.
+    """
+    videos_to_analyze = videos[:3] if len(videos) > 3 else videos
+    payload = {
+        "model": settings.gemini_model,
+        "services": sorted(services or []),
+        "videos": [
+            {
+                "id": v.get("video_id"),
+                "title": v.get("title"),
+                "description": (v.get("description") or "")[:200],
+                "stats": {
+                    name: _stats_bucket(v.get("statistics", {}).get(name))
+                    for name in ("viewCount", "likeCount", "commentCount")
+                },
+            }
+            for v in videos_to_analyze
+        ],
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+async def _get_cached_result(key: str) -> Optional[Dict[str, Any]]:
+    result = _analysis_cache.get(key)
+    if result is not None:
+        metrics.incr("analysis_cache.memory_hit")
+        return result
+
+    try:
+        result = await get_cached_analysis(key)
+    except Exception as e:
+        logger.warning("Analysis cache lookup failed: %s", e)
+        result = None
+
+    if result is not None:
+        metrics.incr("analysis_cache.mongo_hit")
+        _analysis_cache.set(key, result)
+        return result
+
+    metrics.incr("analysis_cache.miss")
+    return None
+
+
+async def _store_result(key: str, result: Dict[str, Any]):
+    _analysis_cache.set(key, result)
+    try:
+        await save_cached_analysis(key, result, settings.analysis_cache_ttl_seconds)
+    except Exception as e:
+        logger.warning("Failed to store analysis result: %s", e)
+
+
+def build_video_details(videos: List[Dict[str, Any]]) -> str:
+    """Build the video section of the prompt (take last 3 videos)."""
     videos_to_analyze = videos[:3] if len(videos) > 3 else videos
     
-    video_details = "\n".join([
+    return "\n".join([
         f"""
 VIDEO {i + 1}:
 - Title: "{v.get('title', 'N/A')}"
@@ -55,6 +270,25 @@ VIDEO {i + 1}:
 """
         for i, v in enumerate(videos_to_analyze)
     ])
+
+
+async def call_gemini_api(
+    videos: List[Dict[str, Any]],
+    channel_stats: Dict[str, Any] = None,
+    services: List[str] = None,
+    on_service: Optional[ServiceCallback] = None,
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    Call Gemini API with service-specific prompts, constraining the output
+    to the selected services' schema and validating every part of it.
+
+    Returns:
+        (report, complete) where complete is False if any part fell back
+    """
+    
+    video_details = build_video_details(videos)
+    selected = [sid for sid in dict.fromkeys(services or []) if sid in SERVICE_MAP]
+    response_schema = build_response_schema(tuple(SERVICE_MAP[sid] for sid in selected))
     
     # Build service-specific prompt
     service_instructions = build_service_instructions(services or [])
@@ -284,43 +518,412 @@ Remember:
     
     print(f"Calling Gemini API with {len(services or [])} services... (prompt length: {len(prompt)})")
     
-    # Initialize Gemini client
-    client = genai.Client(api_key=settings.gemini_api_key)
-    
-    # Call Gemini API
-    response = await client.aio.models.generate_content(
-        model='gemini-2.5-flash',
-        contents=prompt,
-        config=types.GenerateContentConfig(
-            temperature=0.7,
-            system_instruction="You are an expert YouTube content strategist. Always respond with valid JSON only."
-        )
-    )
-    
-    response_text = response.text
+    if settings.gemini_streaming and on_service is not None:
+        response_text = await generate_stream(prompt, on_service, response_schema)
+    else:
+        response_text = await generate(prompt, response_schema)
     print(f"Gemini response received (length: {len(response_text)})")
     
     # Parse JSON from response
     try:
-        # Clean up response - remove markdown code blocks if present
-        cleaned_response = response_text.replace('```json\n', '').replace('```\n', '').replace('```', '').strip()
-        
-        analysis_result = json.loads(cleaned_response)
-        return analysis_result
+        report = parse_json_response(response_text)
         
     except json.JSONDecodeError as parse_error:
         print(f"Failed to parse Gemini response as JSON: {str(parse_error)}")
-        # Return fallback
-        return get_fallback_analysis(videos, services)
+        # Nothing usable: ask for each service on its own instead
+        metrics.incr("gemini.invalid_json")
+        return await call_gemini_per_service(videos, services, on_service)
 
+    return await _validate_report(report, videos, selected, video_details, on_service)
 
-def build_service_instructions(services: List[str]) -> str:
-    """Build prompt instructions based on selected services."""
-    
-    instructions = "PERFORM THE FOLLOWING ANALYSES:\n\n"
-    
-    service_prompts = {
-        "1": """1. SEMANTIC TITLE ENGINE (LLM-Driven Headline Generation):
+
+@functools.lru_cache(maxsize=64)
+def build_response_schema(service_names: Tuple[str, ...]) -> Type[BaseModel]:
+    """
+    Model of the combined report for the selected services, passed to
+    Gemini as the response schema.
+    """
+    fields = {"email_summary": (EmailSummary, ...)}
+    if service_names:
+        services_model = create_model(
+            "AnalysisServices",
+            **{name: (SERVICE_MODELS[name], ...) for name in service_names},
+        )
+        fields["services"] = (services_model, ...)
+    return create_model("AnalysisReport", **fields)
+
+
+def validate_service(name: str, value: Any) -> Dict[str, Any]:
+    """Validate one service result against its model (raises ValidationError)."""
+    adapter = SERVICE_ADAPTERS[name]
+    return adapter.dump_python(adapter.validate_python(value), mode="json")
+
+
+def validate_email_summary(value: Any) -> Dict[str, Any]:
+    return EMAIL_SUMMARY_ADAPTER.dump_python(EMAIL_SUMMARY_ADAPTER.validate_python(value), mode="json")
+
+
+async def _validate_report(
+    report: Any,
+    videos: List[Dict[str, Any]],
+    selected: List[str],
+    video_details: str,
+    on_service: Optional[ServiceCallback],
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    Validate each part of a combined report and re-ask Gemini only for the
+    parts that failed validation.
+    """
+    if not isinstance(report, dict):
+        report = {}
+    raw_services = report.get("services") if isinstance(report.get("services"), dict) else {}
+
+    results: Dict[str, Any] = {}
+    reask = []
+    for sid in selected:
+        name = SERVICE_MAP[sid]
+        try:
+            results[sid] = validate_service(name, raw_services.get(name))
+        except ValidationError as e:
+            logger.warning("Service %s failed validation, re-asking: %s", name, e.error_count())
+            metrics.incr("gemini.validation_failed")
+            reask.append(sid)
+
+    # Persist what is valid before re-asking, so a deadline hit during the
+    # re-asks still has these (a repeat for services already streamed)
+    for sid, result in results.items():
+        await _notify(on_service, SERVICE_MAP[sid], result)
+
+    try:
+        email_result = validate_email_summary(report.get("email_summary"))
+        email_task = None
+    except ValidationError:
+        metrics.incr("gemini.validation_failed")
+        email_task = generate_email_summary(video_details, selected)
+
+    reasked = await asyncio.gather(
+        *[generate_service(sid, video_details, on_service) for sid in reask],
+        *([email_task] if email_task else []),
+        return_exceptions=True,
+    )
+    if email_task:
+        *reasked, email_result = reasked
+    results.update(zip(reask, reasked))
+
+    return _assemble_report(videos, selected, results, email_result)
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    return error.code if isinstance(error, genai_errors.APIError) else None
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    return _status_code(error) in RETRYABLE_STATUS_CODES
+
+
+async def _call_gemini(request: Callable[[], Awaitable[T]], hedger: Optional[Hedger] = None) -> T:
+    """
+    Run one Gemini request behind the circuit breaker and the adaptive
+    concurrency limit (hedged with hedger, if given), retrying transient
+    errors with jittered backoff. Raises DeferredError once the API looks
+    unavailable.
+    """
+    attempt = 0
+    while True:
+        await _gemini_breaker.check()
+        try:
+            if hedger is None:
+                result = await _limited(request)
+            else:
+                # Each copy of a hedged request holds its own concurrency slot
+                result = await hedger.run(lambda: _limited(request))
+        except asyncio.CancelledError:
+            # Deadline, hedge or shutdown: neither success nor failure, but a
+            # half-open probe must not stay claimed forever
+            _gemini_breaker.release_probe()
+            raise
+        except Exception as e:
+            if not _is_retryable(e):
+                # The API answered; the request itself is at fault
+                await _gemini_breaker.record_success()
+                raise
+            if _status_code(e) == 429:
+                _gemini_limiter.on_throttle()
+            await _gemini_breaker.record_failure()
+
+            attempt += 1
+            if attempt >= settings.gemini_max_attempts:
+                metrics.incr("gemini.retries_exhausted")
+                raise DeferredError(
+                    f"Gemini unavailable after {attempt} attempts: {e}",
+                    settings.gemini_breaker_cooldown_seconds,
+                ) from e
+
+            delay = backoff_delay(attempt, settings.gemini_backoff_base_seconds, settings.gemini_backoff_max_seconds)
+            logger.warning("Gemini call failed (%s), retrying in %.1fs", e, delay)
+            metrics.incr("gemini.retries")
+            await asyncio.sleep(delay)
+            continue
+
+        _gemini_limiter.on_success()
+        await _gemini_breaker.record_success()
+        return result
+
+
+async def _limited(request: Callable[[], Awaitable[T]]) -> T:
+    async with _gemini_limiter:
+        return await request()
+
+
+def _generation_config(response_schema: Optional[Type[BaseModel]] = None) -> types.GenerateContentConfig:
+    """Generation settings; with a schema Gemini returns JSON matching it."""
+    if response_schema is None:
+        return types.GenerateContentConfig(
+            temperature=0.7,
+            system_instruction=SYSTEM_INSTRUCTION,
+        )
+    return types.GenerateContentConfig(
+        temperature=0.7,
+        system_instruction=SYSTEM_INSTRUCTION,
+        response_mime_type="application/json",
+        response_schema=response_schema,
+    )
+
+
+async def generate(prompt: str, response_schema: Optional[Type[BaseModel]] = None) -> str:
+    """Run a single Gemini generation and return the response text."""
+    client = get_gemini_client()
+
+    async def request():
+        return await client.aio.models.generate_content(
+            model=settings.gemini_model,
+            contents=prompt,
+            config=_generation_config(response_schema),
+        )
+
+    response = await _call_gemini(request, _gemini_hedger if settings.gemini_hedging else None)
+    return response.text
+
+
+async def generate_stream(
+    prompt: str,
+    on_service: ServiceCallback,
+    response_schema: Optional[Type[BaseModel]] = None,
+) -> str:
+    """
+    Stream a Gemini generation, handing each top-level service object to
+    on_service as soon as it is complete and valid. Returns the full
+    response text.
+    """
+    client = get_gemini_client()
+
+    async def request():
+        # A retried stream starts over with a fresh parser
+        parser = JSONObjectStreamParser(container_key="services")
+        chunks = []
+        stream = await client.aio.models.generate_content_stream(
+            model=settings.gemini_model,
+            contents=prompt,
+            config=_generation_config(response_schema),
+        )
+        async for chunk in stream:
+            text = chunk.text or ""
+            chunks.append(text)
+            for name, result in parser.feed(text):
+                if name not in SERVICE_ADAPTERS:
+                    continue
+                try:
+                    result = validate_service(name, result)
+                except ValidationError:
+                    # Re-asked once the full response is in
+                    continue
+                await _notify(on_service, name, result)
+        return "".join(chunks)
+
+    return await _call_gemini(request)
+
+
+async def _notify(on_service: Optional[ServiceCallback], name: str, result: Dict[str, Any]):
+    """Invoke a service callback without letting it break the analysis."""
+    if on_service is None:
+        return
+    try:
+        await on_service(name, result)
+    except Exception as e:
+        logger.warning("Service callback failed for %s: %s", name, e)
+
+
+def parse_json_response(response_text: str) -> Dict[str, Any]:
+    """Parse a JSON response, stripping markdown code fences if present."""
+    cleaned_response = response_text.replace('```json\n', '').replace('```\n', '').replace('```', '').strip()
+    return json.loads(cleaned_response)
+
+
+# ============================================================================
+# PER-SERVICE EXECUTION
+# ============================================================================
+
+async def call_gemini_per_service(
+    videos: List[Dict[str, Any]],
+    services: List[str] = None,
+    on_service: Optional[ServiceCallback] = None,
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    Run one compact prompt per selected service (plus one for the email
+    summary) concurrently and merge the results into the combined report
+    shape. A failed service falls back on its own instead of failing the
+    whole report.
+
+    Returns:
+        (report, complete) where complete is False if any part fell back
+    """
+    video_details = build_video_details(videos)
+    selected = [sid for sid in dict.fromkeys(services or []) if sid in SERVICE_MAP]
+
+    logger.info("Calling Gemini API per service for %d services", len(selected))
+
+    results = await asyncio.gather(
+        *[generate_service(sid, video_details, on_service) for sid in selected],
+        generate_email_summary(video_details, selected),
+        return_exceptions=True,
+    )
+    *service_results, email_result = results
+
+    if not any(isinstance(r, DeferredError) for r in results) and all(isinstance(r, Exception) for r in results):
+        raise RuntimeError(f"All Gemini calls failed: {results[-1]}")
+
+    return _assemble_report(videos, selected, dict(zip(selected, service_results)), email_result)
+
+
+def _assemble_report(
+    videos: List[Dict[str, Any]],
+    selected: List[str],
+    service_results: Dict[str, Union[Dict[str, Any], Exception]],
+    email_result: Union[Dict[str, Any], Exception],
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    Merge per-part results into the report shape; a part that failed falls
+    back on its own.
+
+    Returns:
+        (report, complete) where complete is False if any part fell back
+    """
+    # Gemini unavailable: defer the whole job instead of mixing in fallbacks
+    deferred = next(
+        (r for r in [*service_results.values(), email_result] if isinstance(r, DeferredError)),
+        None,
+    )
+    if deferred is not None:
+        raise deferred
+
+    fallback = get_fallback_analysis(videos, selected)
+    complete = True
+    report = {"email_summary": fallback["email_summary"], "services": {}}
+
+    if isinstance(email_result, Exception):
+        logger.warning("Email summary generation failed, using fallback: %s", email_result)
+        complete = False
+    else:
+        report["email_summary"] = email_result
+
+    for sid in selected:
+        name = SERVICE_MAP[sid]
+        result = service_results.get(sid)
+        if isinstance(result, Exception) or result is None:
+            logger.warning("Service %s failed, using fallback: %s", name, result)
+            metrics.incr("gemini.service_fallback")
+            report["services"][name] = fallback["services"][name]
+            complete = False
+        else:
+            report["services"][name] = result
+
+    return report, complete
+
+
+async def generate_service(
+    service_id: str,
+    video_details: str,
+    on_service: Optional[ServiceCallback] = None,
+) -> Dict[str, Any]:
+    """Generate the analysis for a single service."""
+    name = SERVICE_MAP[service_id]
+    prompt = f"""
+You are an AI-powered YouTube Intelligence Suite used by professional creators and growth teams.
+
+You do NOT give generic advice.
+You produce EXECUTABLE INSIGHTS that can be shown directly in a product dashboard.
+
+===========================
+CHANNEL VIDEO DATA
+===========================
+{video_details}
+
+===========================
+REQUESTED SERVICE
+===========================
+{SERVICE_PROMPTS[service_id]}
+
+===========================
+OUTPUT FORMAT (STRICT)
+===========================
+Return VALID JSON ONLY: a single object for "{name}" matching this JSON schema.
+No markdown. No explanations outside JSON. Use the exact snake_case field names.
+
+{SERVICE_SCHEMAS[name]}
+"""
+    # One targeted re-ask if the output does not match the service model
+    for attempt in range(2):
+        try:
+            result = parse_json_response(await generate(prompt, SERVICE_MODELS[name]))
+            # Tolerate the model wrapping the object in its service name
+            if isinstance(result, dict) and set(result) == {name}:
+                result = result[name]
+            result = validate_service(name, result)
+            break
+        except (json.JSONDecodeError, ValidationError) as e:
+            if attempt:
+                raise
+            logger.warning("Invalid output for %s, asking again: %s", name, e)
+            metrics.incr("gemini.reask")
+
+    await _notify(on_service, name, result)
+    return result
+
+
+async def generate_email_summary(video_details: str, services: List[str]) -> Dict[str, Any]:
+    """Generate the email teaser for the report."""
+    service_names = ", ".join(SERVICE_MAP[sid] for sid in services) or "general channel overview"
+    prompt = f"""
+You are an AI-powered YouTube Intelligence Suite used by professional creators and growth teams.
+
+===========================
+CHANNEL VIDEO DATA
+===========================
+{video_details}
+
+The creator's full report covers: {service_names}.
+
+Write the email teaser that announces the report.
+
+EMAIL SUMMARY RULES:
+- Do NOT reveal full recommendations
+- Tease problems, gaps, or upside
+- Make the creator curious or slightly anxious
+- Assume user has NOT seen the dashboard yet
+- Tone: confident, insightful, premium
+
+Return VALID JSON ONLY matching this JSON schema:
+
+{EMAIL_SUMMARY_SCHEMA}
+"""
+    return validate_email_summary(parse_json_response(await generate(prompt, EmailSummary)))
+
+
+# Service-specific prompt instructions
+SERVICE_PROMPTS = {
+    "1": """1. SEMANTIC TITLE ENGINE (LLM-Driven Headline Generation):
    
    For EACH VIDEO, provide:
    - **Channel Analysis**: Overall assessment of the channel's title strategy, content themes, and approach
@@ -338,16 +941,16 @@ def build_service_instructions(services: List[str]) -> str:
    - Focus on CTR psychology: curiosity gaps, specificity, emotional triggers, power words
    - Avoid generic advice - give concrete, implementable suggestions
    - Growth tips should be unique to this channel's niche and style""",
-        
-        "2": """2. PREDICTIVE CTR ANALYSIS (Thumbnail Saliency Mapping):
+    
+    "2": """2. PREDICTIVE CTR ANALYSIS (Thumbnail Saliency Mapping):
    - Estimate overall channel CTR (0-100%)
    - Compare to industry average
    - Identify what's working or missing in titles/thumbnails
    - Provide 4-6 specific, actionable recommendations to improve click-through rates
    - Include "Potential Increase" estimate with optimizations
    - Highlight psychological triggers that could boost engagement""",
-        
-        "3": """3. MULTI-PLATFORM MASTERY (Cross-Platform Algorithm Alignment):
+    
+    "3": """3. MULTI-PLATFORM MASTERY (Cross-Platform Algorithm Alignment):
    - Analyze how this content would perform on:
      * YouTube (long-form, algorithm preferences)
      * X / Twitter (short-form threads, viral hooks)
@@ -358,8 +961,8 @@ def build_service_instructions(services: List[str]) -> str:
      * Optimization tips (concrete actions)
    - Do NOT repeat the same advice across platforms
    - Suggest content adaptations, not just reposting""",
-        
-        "7": """4. COPYRIGHT PROTECTION (Content ID Scanning Pre-Upload):
+    
+    "7": """4. COPYRIGHT PROTECTION (Content ID Scanning Pre-Upload):
    
    IMPORTANT: Only flag ACTUAL copyright issues:
    - Background music from copyrighted sources
@@ -378,8 +981,8 @@ def build_service_instructions(services: List[str]) -> str:
    - Flags: List ONLY actual copyrighted material detected
    - Assessment: Brief explanation
    - Recommendations: Safe alternatives if risks found""",
-        
-        "8": """5. FAIR USE ANALYSIS (Transformative Content Assessment):
+    
+    "8": """5. FAIR USE ANALYSIS (Transformative Content Assessment):
    - Evaluate transformativeness of the content (0-100 score)
    - Assess commentary, criticism, or educational value
    - Break down fair use factors:
@@ -388,18 +991,24 @@ def build_service_instructions(services: List[str]) -> str:
      * Amount used
      * Market effect
    - Provide clear recommendation for legal safety""",
-        
-        "10": """6. TREND INTELLIGENCE (48-Hour Early Trend Detection):
+    
+    "10": """6. TREND INTELLIGENCE (48-Hour Early Trend Detection):
    - Identify 3-5 trending topics related to this channel's niche
    - For each topic: name, growth percentage, relevance rating
    - Provide 3-5 specific predictions for the next 24-72 hours
    - Suggest 3-5 actionable content ideas aligned with emerging trends
    - Focus on EARLY signals, not obvious trends everyone already covers"""
-    }
+}
+
+
+def build_service_instructions(services: List[str]) -> str:
+    """Build prompt instructions based on selected services."""
+    
+    instructions = "PERFORM THE FOLLOWING ANALYSES:\n\n"
     
     for service_id in services:
-        if service_id in service_prompts:
-            instructions += service_prompts[service_id] + "\n\n"
+        if service_id in SERVICE_PROMPTS:
+            instructions += SERVICE_PROMPTS[service_id] + "\n\n"
     
     if not instructions.strip().endswith("ANALYSES:"):
         return instructions
@@ -1,7 +1,14 @@
-from motor.motor_asyncio import AsyncIOMotorClient
-from typing import Optional, Dict, Any
+import zlib
+import bson
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from typing import Optional, Dict, Any, List, Tuple
+from datetime import datetime, timedelta, timezone
 from bson import ObjectId
 from app.core.config import settings
+from app.models.models import PENDING_JOB_STATUSES
+from app.core.events import publish_job_update
 
 # Global MongoDB client (singleton)
 _client: Optional[AsyncIOMotorClient] = None
@@ -23,6 +30,9 @@ def get_client() -> AsyncIOMotorClient:
             connectTimeoutMS=30000,  # 30 seconds
             retryWrites=True,
             retryReads=True,
+            # Datetimes come back as aware UTC, comparable with datetime.now(timezone.utc)
+            tz_aware=True,
+            tzinfo=timezone.utc,
         )
     return _client
 
@@ -44,6 +54,42 @@ async def create_job(document: Dict[str, Any]) -> str:
     return str(result.inserted_id)
 
 
+async def create_job_once(document: Dict[str, Any]) -> Tuple[str, bool]:
+    """
+    Inserts a job unless one with the same (email, idempotency_key) exists.
+    Returns (job ID, created) where created is False for a repeated key.
+    """
+    db = get_db()
+    try:
+        result = await db.jobs.insert_one(document)
+        return str(result.inserted_id), True
+    except DuplicateKeyError:
+        existing_id = await find_job_by_idempotency_key(document["email"], document["idempotency_key"])
+        if existing_id is None:
+            raise
+        return existing_id, False
+
+
+async def find_job_by_idempotency_key(email: str, idempotency_key: str) -> Optional[str]:
+    """
+    Returns the ID of the job submitted by email with the given key, or None.
+    """
+    db = get_db()
+    job = await db.jobs.find_one({"email": email, "idempotency_key": idempotency_key}, {"_id": 1})
+    return str(job["_id"]) if job else None
+
+
+async def count_pending_jobs(email: Optional[str] = None) -> int:
+    """
+    Counts jobs not yet completed or failed, optionally for a single user.
+    """
+    db = get_db()
+    query: Dict[str, Any] = {"status": {"$in": PENDING_JOB_STATUSES}}
+    if email is not None:
+        query["email"] = email
+    return await db.jobs.count_documents(query)
+
+
 async def get_job(job_id: str) -> Optional[Dict[str, Any]]:
     """
     Retrieves a job document by its ID.
@@ -63,7 +109,8 @@ async def get_job(job_id: str) -> Optional[Dict[str, Any]]:
 
 async def update_job(job_id: str, update_data: Dict[str, Any]) -> bool:
     """
-    Updates a job document with the provided data.
+    Updates a job document with the provided data and bumps updated_at.
+    Supports both $set operations and MongoDB operators like $unset
     Returns True if the update was successful, False otherwise.
     """
     db = get_db()
@@ -72,10 +119,512 @@ async def update_job(job_id: str, update_data: Dict[str, Any]) -> bool:
     except Exception:
         return False
 
-    result = await db.jobs.update_one({"_id": oid}, {"$set": update_data})
+    # Every change bumps updated_at, which job ETags are derived from
+    now = datetime.now(timezone.utc)
+    if any(key.startswith('$') for key in update_data.keys()):
+        update_operation = {**update_data, "$set": {"updated_at": now, **update_data.get("$set", {})}}
+    else:
+        update_operation = {"$set": {"updated_at": now, **update_data}}
+
+    result = await db.jobs.update_one({"_id": oid}, update_operation)
+    if result.modified_count > 0:
+        publish_job_update(job_id, update_data)
     return result.modified_count > 0
 
 
+async def get_job_fields(job_id: str, fields: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    Retrieves only the given fields of a job document (Mongo projection).
+    Returns the partial document or None if not found.
+    """
+    db = get_db()
+    try:
+        oid = ObjectId(job_id)
+    except Exception:
+        return None
+
+    job = await db.jobs.find_one({"_id": oid}, {field: 1 for field in fields})
+    if job:
+        job["_id"] = str(job["_id"])
+    return job
+
+
+async def list_jobs_by_email(
+    email: str,
+    limit: int,
+    before: Optional[ObjectId] = None,
+    fields: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Lists a user's jobs newest first, using keyset pagination on _id (which
+    orders by creation time, also for jobs without created_at): only jobs
+    older than before are returned.
+    """
+    db = get_db()
+    query: Dict[str, Any] = {"email": email}
+    if before is not None:
+        query["_id"] = {"$lt": before}
+
+    projection = {field: 1 for field in fields} if fields else None
+    cursor = db.jobs.find(query, projection).sort("_id", -1).limit(limit)
+    jobs = await cursor.to_list(length=limit)
+    for job in jobs:
+        job["_id"] = str(job["_id"])
+    return jobs
+
+
+def _runnable_job_filter(now: datetime) -> Dict[str, Any]:
+    """
+    Jobs a worker may claim: pending, with a missing or expired lease and
+    not deferred until later.
+    """
+    return {
+        "status": {"$in": PENDING_JOB_STATUSES},
+        "$and": [
+            {"$or": [
+                {"lease_expires_at": None},
+                {"lease_expires_at": {"$lt": now}},
+            ]},
+            {"$or": [
+                {"not_before": None},
+                {"not_before": {"$lte": now}},
+            ]},
+        ],
+    }
+
+
+async def get_runnable_job_heads() -> List[Dict[str, Any]]:
+    """
+    Summarises the runnable queue per user: for every (plan, email) the
+    oldest runnable job ({"plan", "email", "job_id", "created_at"}).
+    Jobs without a plan count as "free"; jobs without created_at (created
+    before it was always set) use their ObjectId's creation time, so every
+    head carries an aware UTC datetime.
+    """
+    db = get_db()
+    pipeline = [
+        {"$match": _runnable_job_filter(datetime.now(timezone.utc))},
+        {"$sort": {"created_at": 1, "_id": 1}},
+        {"$group": {
+            "_id": {"plan": {"$ifNull": ["$plan", "free"]}, "email": "$email"},
+            "job_id": {"$first": "$_id"},
+            "created_at": {"$first": "$created_at"},
+        }},
+    ]
+    heads = []
+    async for group in db.jobs.aggregate(pipeline):
+        heads.append({
+            "plan": group["_id"]["plan"],
+            "email": group["_id"]["email"],
+            "job_id": str(group["job_id"]),
+            "created_at": group["created_at"] or group["job_id"].generation_time,
+        })
+    return heads
+
+
+async def count_running_jobs_per_user() -> Dict[str, int]:
+    """
+    Returns {email: number of jobs currently leased by a worker}.
+    """
+    db = get_db()
+    pipeline = [
+        {"$match": {
+            "status": {"$in": PENDING_JOB_STATUSES},
+            "lease_expires_at": {"$gt": datetime.now(timezone.utc)},
+        }},
+        {"$group": {"_id": "$email", "running": {"$sum": 1}}},
+    ]
+    return {group["_id"]: group["running"] async for group in db.jobs.aggregate(pipeline)}
+
+
+async def claim_job(job_id: str, worker_id: str, lease_seconds: int) -> Optional[Dict[str, Any]]:
+    """
+    Atomically claims a specific job for a worker if it is still runnable
+    (pending, lease missing or expired, so jobs abandoned by a crashed
+    worker are picked up again).
+    Returns the claimed job document or None if another worker got it first.
+    """
+    db = get_db()
+    now = datetime.now(timezone.utc)
+    job = await db.jobs.find_one_and_update(
+        {"_id": ObjectId(job_id), **_runnable_job_filter(now)},
+        {
+            "$set": {
+                "lease_owner": worker_id,
+                "lease_expires_at": now + timedelta(seconds=lease_seconds),
+            },
+            "$inc": {"attempts": 1},
+        },
+        return_document=ReturnDocument.AFTER,
+    )
+    if job:
+        job["_id"] = str(job["_id"])
+    return job
+
+
+async def defer_job(job_id: str, worker_id: str, not_before: datetime, reason: str) -> bool:
+    """
+    Puts a claimed job back in the queue until not_before. The attempt is
+    not counted, since the job did not fail.
+    """
+    db = get_db()
+    result = await db.jobs.update_one(
+        {"_id": ObjectId(job_id), "lease_owner": worker_id},
+        {
+            "$set": {
+                "not_before": not_before,
+                "deferred_reason": reason,
+                "updated_at": datetime.now(timezone.utc),
+            },
+            # A deferred job starts with a fresh deadline when it runs again
+            "$unset": {"deadline_at": ""},
+            "$inc": {"attempts": -1},
+        },
+    )
+    return result.modified_count > 0
+
+
+async def heartbeat_job(job_id: str, worker_id: str, lease_seconds: int) -> bool:
+    """
+    Extends the lease on a job still owned by the given worker.
+    Returns False if the lease was lost (e.g. expired and re-claimed).
+    """
+    db = get_db()
+    result = await db.jobs.update_one(
+        {"_id": ObjectId(job_id), "lease_owner": worker_id},
+        {"$set": {
+            "lease_expires_at": datetime.now(timezone.utc) + timedelta(seconds=lease_seconds),
+        }},
+    )
+    return result.matched_count > 0
+
+
+async def release_job(job_id: str, worker_id: str) -> bool:
+    """
+    Drops the worker's lease on a job so it can be claimed again if still pending.
+    """
+    db = get_db()
+    result = await db.jobs.update_one(
+        {"_id": ObjectId(job_id), "lease_owner": worker_id},
+        {"$unset": {"lease_owner": "", "lease_expires_at": ""}},
+    )
+    return result.modified_count > 0
+
+
+async def save_job_payload(job_id: str, kind: str, value: Any) -> str:
+    """
+    Stores a large job value (videos, report) zlib-compressed in the
+    job_payloads collection, or in GridFS above the size threshold.
+    Saving the same kind again for a job replaces it.
+    Returns the payload reference to keep on the job.
+    """
+    db = get_db()
+    payload_id = f"{job_id}:{kind}"
+    raw = bson.encode({"value": value})
+    data = zlib.compress(raw, settings.job_payload_compression_level)
+
+    previous = await db.job_payloads.find_one({"_id": payload_id}, {"gridfs_id": 1})
+
+    document = {
+        "job_id": job_id,
+        "kind": kind,
+        "codec": "zlib",
+        "size": len(raw),
+        "stored_size": len(data),
+        "created_at": datetime.now(timezone.utc),
+    }
+    if len(data) > settings.job_payload_gridfs_threshold_bytes:
+        bucket = AsyncIOMotorGridFSBucket(db, bucket_name="job_payloads")
+        document["gridfs_id"] = await bucket.upload_from_stream(payload_id, data)
+        update = {"$set": document, "$unset": {"data": ""}}
+    else:
+        document["data"] = data
+        update = {"$set": document, "$unset": {"gridfs_id": ""}}
+
+    await db.job_payloads.update_one({"_id": payload_id}, update, upsert=True)
+
+    if previous and previous.get("gridfs_id"):
+        bucket = AsyncIOMotorGridFSBucket(db, bucket_name="job_payloads")
+        await bucket.delete(previous["gridfs_id"])
+
+    return payload_id
+
+
+async def load_job_payload(payload_id: str) -> Any:
+    """
+    Loads and decompresses a value stored with save_job_payload.
+    Returns None if the payload does not exist.
+    """
+    db = get_db()
+    payload = await db.job_payloads.find_one({"_id": payload_id})
+    if not payload:
+        return None
+
+    if payload.get("gridfs_id"):
+        bucket = AsyncIOMotorGridFSBucket(db, bucket_name="job_payloads")
+        stream = await bucket.open_download_stream(payload["gridfs_id"])
+        data = await stream.read()
+    else:
+        data = payload["data"]
+
+    return bson.decode(zlib.decompress(data))["value"]
+
+
+async def consume_daily_quota(day: str, cost: int, limit: int) -> bool:
+    """
+    Adds cost to the quota units used on day unless that would exceed limit.
+    Returns True if the units were granted.
+    """
+    db = get_db()
+    try:
+        await db.youtube_quota.update_one(
+            {"_id": day, "used": {"$lte": limit - cost}},
+            {
+                "$inc": {"used": cost},
+                "$setOnInsert": {"expires_at": datetime.now(timezone.utc) + timedelta(days=2)},
+            },
+            upsert=True,
+        )
+        return True
+    except DuplicateKeyError:
+        # The day's counter exists but has no room left
+        return False
+
+
+async def exhaust_daily_quota(day: str, limit: int):
+    """
+    Marks the quota for day as fully used.
+    """
+    db = get_db()
+    await db.youtube_quota.update_one(
+        {"_id": day},
+        {
+            "$max": {"used": limit},
+            "$setOnInsert": {"expires_at": datetime.now(timezone.utc) + timedelta(days=2)},
+        },
+        upsert=True,
+    )
+
+
+async def take_rate_tokens(cost: float, rate: float, capacity: float) -> Tuple[bool, float]:
+    """
+    Token bucket shared by all workers, refilled at rate tokens per second
+    up to capacity. Refill and take happen in one pipeline update.
+    Returns (granted, tokens left in the bucket).
+    """
+    db = get_db()
+    now = datetime.now(timezone.utc)
+    elapsed_seconds = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]}
+    bucket = await db.rate_limits.find_one_and_update(
+        {"_id": "youtube"},
+        [
+            {"$set": {
+                "tokens": {"$min": [capacity, {"$add": [
+                    {"$ifNull": ["$tokens", capacity]},
+                    {"$multiply": [rate, elapsed_seconds]},
+                ]}]},
+                "updated_at": now,
+            }},
+            {"$set": {"granted": {"$gte": ["$tokens", cost]}}},
+            {"$set": {"tokens": {"$cond": ["$granted", {"$subtract": ["$tokens", cost]}, "$tokens"]}}},
+        ],
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return bucket["granted"], bucket["tokens"]
+
+
+async def get_circuit_open_until(name: str) -> Optional[datetime]:
+    """
+    Returns until when the named circuit breaker was opened by any worker.
+    """
+    db = get_db()
+    doc = await db.circuit_breakers.find_one({"_id": name}, {"open_until": 1})
+    return doc["open_until"] if doc else None
+
+
+async def open_circuit(name: str, open_until: datetime):
+    """
+    Records that the named circuit breaker is open until open_until.
+    """
+    db = get_db()
+    await db.circuit_breakers.update_one(
+        {"_id": name},
+        {"$max": {"open_until": open_until}},
+        upsert=True,
+    )
+
+
+async def get_channel_alias(query: str) -> Optional[str]:
+    """
+    Looks up a cached channel ID for a normalized channel query.
+    Returns the channel ID or None if missing or expired.
+    """
+    db = get_db()
+    alias = await db.channel_aliases.find_one({
+        "_id": query,
+        "expires_at": {"$gt": datetime.now(timezone.utc)},
+    })
+    return alias["channel_id"] if alias else None
+
+
+async def save_channel_alias(query: str, channel_id: str, ttl_seconds: int):
+    """
+    Stores a normalized channel query -> channel ID mapping with an expiry.
+    """
+    db = get_db()
+    now = datetime.now(timezone.utc)
+    await db.channel_aliases.update_one(
+        {"_id": query},
+        {"$set": {
+            "channel_id": channel_id,
+            "updated_at": now,
+            "expires_at": now + timedelta(seconds=ttl_seconds),
+        }},
+        upsert=True,
+    )
+
+
+async def get_cached_response(key: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns a persisted YouTube API response ({"etag", "body"}) or None.
+    """
+    db = get_db()
+    return await db.youtube_responses.find_one(
+        {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+        {"etag": 1, "body": 1},
+    )
+
+
+async def save_cached_response(key: str, etag: str, body: bytes, ttl_seconds: int):
+    """
+    Persists a YouTube API response body together with its ETag.
+    """
+    db = get_db()
+    await db.youtube_responses.update_one(
+        {"_id": key},
+        {"$set": {
+            "etag": etag,
+            "body": body,
+            "expires_at": datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds),
+        }},
+        upsert=True,
+    )
+
+
+async def acquire_analysis_lock(key: str, owner: str, ttl_seconds: int, take_finished: bool = False) -> bool:
+    """
+    Tries to become the process that runs the analysis identified by key.
+    Succeeds if no lock exists or the existing one has expired (or, with
+    take_finished, already holds a finished result).
+    Returns True if the lock was acquired.
+    """
+    db = get_db()
+    now = datetime.now(timezone.utc)
+    query: Dict[str, Any] = {"_id": key, "expires_at": {"$lt": now}}
+    if take_finished:
+        query = {"_id": key, "$or": [{"expires_at": {"$lt": now}}, {"result": {"$exists": True}}]}
+    try:
+        await db.analysis_locks.update_one(
+            query,
+            {
+                "$set": {"owner": owner, "expires_at": now + timedelta(seconds=ttl_seconds)},
+                "$unset": {"result": "", "partial": ""},
+            },
+            upsert=True,
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+
+async def get_analysis_lock(key: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns the live (non-expired) lock document for key, or None.
+    """
+    db = get_db()
+    return await db.analysis_locks.find_one({
+        "_id": key,
+        "expires_at": {"$gt": datetime.now(timezone.utc)},
+    })
+
+
+async def complete_analysis_lock(key: str, owner: str, result: Dict[str, Any], ttl_seconds: int):
+    """
+    Publishes the analysis result on the lock so waiting processes can use it.
+    """
+    db = get_db()
+    await db.analysis_locks.update_one(
+        {"_id": key, "owner": owner},
+        {"$set": {
+            "result": result,
+            "expires_at": datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds),
+        }},
+    )
+
+
+async def renew_analysis_lock(key: str, owner: str, ttl_seconds: int) -> bool:
+    """
+    Extends the lock of a running analysis (no-op once a result is
+    published). Returns False if the lock is no longer held by owner.
+    """
+    db = get_db()
+    result = await db.analysis_locks.update_one(
+        {"_id": key, "owner": owner, "result": {"$exists": False}},
+        {"$set": {"expires_at": datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)}},
+    )
+    return result.matched_count > 0
+
+
+async def save_analysis_lock_progress(key: str, owner: str, name: str, result: Dict[str, Any]):
+    """
+    Records one finished service of a running analysis on its lock so
+    waiting processes can follow it.
+    """
+    db = get_db()
+    await db.analysis_locks.update_one(
+        {"_id": key, "owner": owner},
+        {"$set": {f"partial.{name}": result}},
+    )
+
+
+async def release_analysis_lock(key: str, owner: str):
+    """
+    Drops a lock without a result (e.g. after a failure) so others can retry.
+    """
+    db = get_db()
+    await db.analysis_locks.delete_one({"_id": key, "owner": owner})
+
+
+async def get_cached_analysis(key: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns a cached AI analysis result for a content hash, or None.
+    """
+    db = get_db()
+    doc = await db.analysis_cache.find_one({
+        "_id": key,
+        "expires_at": {"$gt": datetime.now(timezone.utc)},
+    })
+    return doc["result"] if doc else None
+
+
+async def save_cached_analysis(key: str, result: Dict[str, Any], ttl_seconds: int):
+    """
+    Stores an AI analysis result under its content hash.
+    """
+    db = get_db()
+    now = datetime.now(timezone.utc)
+    await db.analysis_cache.update_one(
+        {"_id": key},
+        {"$set": {
+            "result": result,
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=ttl_seconds),
+        }},
+        upsert=True,
+    )
+
+
 async def close_client():
     """
     Closes the MongoDB client connection.
@@ -87,6 +636,11 @@ async def close_client():
 
 
 # User operations
+
+# Fields left out of user reads (legacy unbounded list of job IDs)
+USER_PROJECTION = {"job_ids": 0}
+
+
 async def create_user(user_data: Dict[str, Any]) -> str:
     """
     Create a new user document
@@ -103,7 +657,7 @@ async def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
     Returns user document or None
     """
     db = get_db()
-    user = await db.users.find_one({"email": email})
+    user = await db.users.find_one({"email": email}, USER_PROJECTION)
     if user:
         user["_id"] = str(user["_id"])
     return user
@@ -115,7 +669,7 @@ async def get_user_by_username(username: str) -> Optional[Dict[str, Any]]:
     Returns user document or None
     """
     db = get_db()
-    user = await db.users.find_one({"username": username})
+    user = await db.users.find_one({"username": username}, USER_PROJECTION)
     if user:
         user["_id"] = str(user["_id"])
     return user
@@ -128,7 +682,7 @@ async def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
     """
     db = get_db()
     try:
-        user = await db.users.find_one({"_id": ObjectId(user_id)})
+        user = await db.users.find_one({"_id": ObjectId(user_id)}, USER_PROJECTION)
         if user:
             user["_id"] = str(user["_id"])
         return user
@@ -160,6 +714,56 @@ async def update_user(user_id: str, update_data: Dict[str, Any]) -> bool:
         return False
 
 
+async def reserve_user_job_slot(email: str, max_active: int) -> Optional[Dict[str, Any]]:
+    """
+    Counts a new job against the user's active_jobs, but only while it is
+    below max_active (single conditional update, no prior read).
+    Returns the user's {"plan"} if reserved, None otherwise.
+    """
+    db = get_db()
+    user = await db.users.find_one_and_update(
+        {"email": email, "active_jobs": {"$lt": max_active}},
+        {"$inc": {"total_jobs": 1, "active_jobs": 1}},
+        projection={"plan": 1},
+    )
+    if user:
+        user["_id"] = str(user["_id"])
+    return user
+
+
+async def user_exists(email: str) -> bool:
+    """
+    Returns True if a user with this email exists.
+    """
+    db = get_db()
+    return await db.users.count_documents({"email": email}, limit=1) > 0
+
+
+async def release_user_job_slot(email: str, count_job: bool = False) -> bool:
+    """
+    Gives back an active_jobs slot when a job finishes. With count_job the
+    reservation is undone completely (the job was never created).
+    """
+    db = get_db()
+    increments = {"active_jobs": -1}
+    if count_job:
+        increments["total_jobs"] = -1
+    result = await db.users.update_one(
+        {"email": email, "active_jobs": {"$gt": 0}},
+        {"$inc": increments},
+    )
+    return result.modified_count > 0
+
+
+async def set_user_active_jobs(email: str, active_jobs: int) -> bool:
+    """
+    Overwrites a user's active_jobs counter (used to correct drift).
+    """
+    db = get_db()
+    result = await db.users.update_one({"email": email}, {"$set": {"active_jobs": active_jobs}})
+    return result.modified_count > 0
+
+
 async def delete_user(user_id: str) -> bool:
     """
     Delete user document
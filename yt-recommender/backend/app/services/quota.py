@@ -0,0 +1,109 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import settings
+from app.core import metrics
+from app.core.errors import DeferredError
+from app.services.mongo_client import (
+    consume_daily_quota, exhaust_daily_quota, take_rate_tokens,
+)
+
+logger = logging.getLogger(__name__)
+
+# YouTube Data API quota cost per call; every other endpoint costs 1 unit
+ENDPOINT_COSTS = {
+    "/search": 100,
+}
+
+
+class QuotaExhaustedError(DeferredError):
+    """The YouTube quota budget does not allow this call right now."""
+
+
+def cost_of(path: str) -> int:
+    """Quota units charged for one call to a YouTube endpoint."""
+    return ENDPOINT_COSTS.get(path, 1)
+
+
+def _quota_day(now: datetime) -> str:
+    return now.strftime("%Y-%m-%d")
+
+
+def _seconds_until_reset(now: datetime) -> float:
+    tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (tomorrow - now).total_seconds()
+
+
+def _daily_budget(new_work: bool) -> int:
+    # Calls that start new work stop short of the reserve, which is left for
+    # jobs already under way to finish their remaining cheap calls
+    if new_work:
+        return settings.youtube_daily_quota - settings.youtube_quota_reserve
+    return settings.youtube_daily_quota
+
+
+async def acquire(path: str, new_work: bool = False):
+    """
+    Charge one call to path against the shared quota before it is made.
+
+    Waits for the cross-worker token bucket when calls come in faster than
+    the configured rate. Raises QuotaExhaustedError when the daily budget
+    is spent, or the bucket would not have room within the maximum wait,
+    so the job is deferred instead of failing. Pass new_work for calls that
+    start a job's spending (channel resolution): they may not dip into the
+    reserve. Accounting errors are logged and the call is allowed.
+    """
+    cost = cost_of(path)
+
+    try:
+        await _take_tokens(path, cost)
+
+        now = datetime.now(timezone.utc)
+        if not await consume_daily_quota(_quota_day(now), cost, _daily_budget(new_work)):
+            metrics.incr("youtube_quota.exhausted")
+            raise QuotaExhaustedError(
+                "YouTube API quota exhausted for today",
+                _seconds_until_reset(now),
+            )
+    except QuotaExhaustedError:
+        raise
+    except Exception as e:
+        logger.warning("YouTube quota accounting unavailable: %s", e)
+        return
+
+    metrics.incr("youtube_quota.units", cost)
+
+
+async def _take_tokens(path: str, cost: int):
+    # A call pricier than the whole bucket only has to wait for a full bucket
+    cost = min(cost, settings.youtube_rate_burst)
+    waited = 0.0
+    while True:
+        granted, tokens = await take_rate_tokens(
+            cost, settings.youtube_rate_units_per_second, settings.youtube_rate_burst,
+        )
+        if granted:
+            return
+
+        wait = (cost - tokens) / settings.youtube_rate_units_per_second
+        if waited + wait > settings.youtube_rate_max_wait_seconds:
+            metrics.incr("youtube_quota.rate_deferred")
+            raise QuotaExhaustedError(f"YouTube API rate limit reached for {path}", wait)
+
+        metrics.incr("youtube_quota.rate_waits")
+        await asyncio.sleep(wait)
+        waited += wait
+
+
+async def mark_exhausted():
+    """
+    Record that YouTube itself reported the quota as exceeded, so other
+    workers stop calling until the next day.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        await exhaust_daily_quota(_quota_day(now), settings.youtube_daily_quota)
+    except Exception as e:
+        logger.warning("Failed to record exhausted YouTube quota: %s", e)
+    raise QuotaExhaustedError("YouTube API quota exceeded", _seconds_until_reset(now))
@@ -1,12 +1,42 @@
+import asyncio
 import httpx
-from typing import List, Dict, Any, Optional
+import json
+import logging
+import re
+from urllib.parse import urlencode
+from typing import List, Dict, Any, Optional, Set, Tuple
 from app.core.config import settings
+from app.core import metrics
+from app.services.mongo_client import (
+    get_channel_alias, save_channel_alias, get_cached_response, save_cached_response
+)
+from app.services import quota
+from app.utils.cache import TTLCache, ByteLRUCache
+
+logger = logging.getLogger(__name__)
 
 BASE_URL = "https://www.googleapis.com/youtube/v3"
 
 # Shared HTTP client (singleton)
 _client: Optional[httpx.AsyncClient] = None
 
+# Channel references that can be resolved without /search
+_CHANNEL_ID_RE = re.compile(r"^UC[\w-]{22}$")
+_CHANNEL_URL_RE = re.compile(r"youtube\.com/channel/(UC[\w-]{22})", re.IGNORECASE)
+_HANDLE_URL_RE = re.compile(r"youtube\.com/(@[\w.\-]+)", re.IGNORECASE)
+_USER_URL_RE = re.compile(r"youtube\.com/user/([\w.\-]+)", re.IGNORECASE)
+_HANDLE_RE = re.compile(r"^@[\w.\-]{3,30}$")
+
+# First tier of the channel resolution cache; the second tier is the
+# channel_aliases collection shared by all workers.
+_channel_cache = TTLCache(
+    maxsize=settings.channel_cache_size,
+    ttl=settings.channel_cache_ttl_seconds,
+)
+
+# Conditional-request cache: request key -> (etag, raw body)
+_response_cache = ByteLRUCache(max_bytes=settings.youtube_cache_max_bytes)
+
 
 def get_http_client() -> httpx.AsyncClient:
     global _client
@@ -18,23 +48,278 @@ def get_http_client() -> httpx.AsyncClient:
     return _client
 
 
+def _cache_key(path: str, params: Dict[str, Any]) -> str:
+    """Build a cache key from the endpoint and its params (API key excluded)."""
+    cacheable = sorted((k, str(v)) for k, v in params.items() if k != "key")
+    return f"{path}?{urlencode(cacheable)}"
+
+
+async def _raise_for_status(resp: httpx.Response):
+    """Like raise_for_status, but a quotaExceeded 403 defers the job instead."""
+    if resp.status_code == 403 and b"quotaExceeded" in resp.content:
+        await quota.mark_exhausted()
+    resp.raise_for_status()
+
+
+async def api_get(
+    path: str,
+    params: Dict[str, Any],
+    cache: bool = True,
+    new_work: bool = False,
+) -> Dict[str, Any]:
+    """
+    GET a YouTube Data API endpoint, revalidating cached responses with
+    If-None-Match so unchanged resources come back as 304 without a body.
+    Pass cache=False for one-off requests that are unlikely to repeat, and
+    new_work for calls that start a job's quota spending (see quota.acquire).
+    """
+    client = get_http_client()
+
+    if not cache:
+        await quota.acquire(path, new_work=new_work)
+        resp = await client.get(path, params={**params, "key": settings.youtube_api_key})
+        await _raise_for_status(resp)
+        return resp.json()
+
+    key = _cache_key(path, params)
+
+    cached = _response_cache.get(key)
+    if cached is None and settings.youtube_cache_persist:
+        try:
+            doc = await get_cached_response(key)
+        except Exception as e:
+            logger.warning("YouTube response cache lookup failed: %s", e)
+            doc = None
+        if doc:
+            cached = (doc["etag"], bytes(doc["body"]))
+
+    headers = {"If-None-Match": cached[0]} if cached else None
+    await quota.acquire(path, new_work=new_work)
+    resp = await client.get(path, params={**params, "key": settings.youtube_api_key}, headers=headers)
+
+    if resp.status_code == 304 and cached:
+        metrics.incr("youtube_cache.not_modified")
+        etag, body = cached
+        _response_cache.set(key, cached, size=len(body) + len(etag))
+        return json.loads(body)
+
+    await _raise_for_status(resp)
+    metrics.incr("youtube_cache.miss")
+
+    etag = resp.headers.get("ETag")
+    if etag:
+        body = resp.content
+        _response_cache.set(key, (etag, body), size=len(body) + len(etag))
+        if settings.youtube_cache_persist:
+            try:
+                await save_cached_response(key, etag, body, settings.youtube_cache_ttl_seconds)
+            except Exception as e:
+                logger.warning("Failed to persist YouTube response: %s", e)
+
+    return resp.json()
+
+
+class VideoStatsBatcher:
+    """
+    Collects /videos statistics lookups from concurrent jobs for a short
+    window and issues them as packed requests of up to 50 IDs (the API
+    maximum, at the same quota cost as a single ID).
+    """
+
+    def __init__(self, window_seconds: float, batch_size: int = 50):
+        self.window_seconds = window_seconds
+        self.batch_size = batch_size
+        self._pending: Dict[str, List[asyncio.Future]] = {}
+        self._timer: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def get(self, video_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Return {video_id: statistics} for the requested IDs."""
+        loop = asyncio.get_running_loop()
+        futures = {}
+        for vid in dict.fromkeys(video_ids):
+            future = loop.create_future()
+            self._pending.setdefault(vid, []).append(future)
+            futures[vid] = future
+
+        if len(self._pending) >= self.batch_size:
+            self._spawn(self._flush())
+        elif self._timer is None:
+            self._timer = self._spawn(self._flush_after_window())
+
+        results = await asyncio.gather(*futures.values())
+        return {
+            vid: stats
+            for vid, stats in zip(futures, results)
+            if stats is not None
+        }
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _flush_after_window(self):
+        await asyncio.sleep(self.window_seconds)
+        self._timer = None
+        await self._flush()
+
+    async def _flush(self):
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        ids = list(pending)
+        chunks = [ids[i:i + self.batch_size] for i in range(0, len(ids), self.batch_size)]
+        metrics.incr("video_stats.requests", len(chunks))
+        metrics.incr("video_stats.ids", len(ids))
+        await asyncio.gather(*[self._fetch_chunk(chunk, pending) for chunk in chunks])
+
+    async def _fetch_chunk(self, chunk: List[str], pending: Dict[str, List[asyncio.Future]]):
+        try:
+            data = await api_get(
+                "/videos",
+                params={
+                    "part": "statistics",
+                    "id": ",".join(chunk),
+                },
+                cache=False,
+            )
+        except Exception as e:
+            for vid in chunk:
+                for future in pending[vid]:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        stats_map = {
+            v["id"]: v["statistics"]
+            for v in data.get("items", [])
+        }
+        for vid in chunk:
+            for future in pending[vid]:
+                if not future.done():
+                    future.set_result(stats_map.get(vid))
+
+
+_stats_batcher = VideoStatsBatcher(window_seconds=settings.youtube_batch_window_ms / 1000)
+
+
+def normalize_channel_query(channel_query: str) -> str:
+    """Normalize a channel query so equivalent inputs share a cache entry."""
+    return " ".join(channel_query.strip().lower().split())
+
+
+def parse_channel_reference(channel_query: str) -> Optional[Tuple[str, str]]:
+    """
+    Recognise channel IDs, handles and channel URLs locally.
+    Returns (kind, value) with kind one of "id", "handle", "username",
+    or None if the query has to go through /search.
+    """
+    query = channel_query.strip()
+
+    if _CHANNEL_ID_RE.match(query):
+        return "id", query
+
+    match = _CHANNEL_URL_RE.search(query)
+    if match:
+        return "id", match.group(1)
+
+    match = _HANDLE_URL_RE.search(query)
+    if match:
+        return "handle", match.group(1)
+
+    match = _USER_URL_RE.search(query)
+    if match:
+        return "username", match.group(1)
+
+    if _HANDLE_RE.match(query):
+        return "handle", query
+
+    return None
+
+
+async def lookup_channel(kind: str, value: str) -> Optional[str]:
+    """
+    Resolves a parsed channel reference through /channels (1 quota unit).
+    Returns the channel ID or None if YouTube does not know it.
+    """
+    param = {"id": "id", "handle": "forHandle", "username": "forUsername"}[kind]
+    data = await api_get(
+        "/channels",
+        params={
+            "part": "id",
+            param: value,
+        },
+        new_work=True,
+    )
+    items = data.get("items", [])
+
+    return items[0]["id"] if items else None
+
+
 async def resolve_channel(channel_query: str) -> str:
     """
     Resolves a channel name / handle / query to a channel ID.
+    Checks the in-process cache, then the shared Mongo cache, then tries a
+    1-unit /channels lookup for IDs, handles and URLs before spending a
+    100-unit /search call.
     """
-    client = get_http_client()
+    key = normalize_channel_query(channel_query)
+
+    channel_id = _channel_cache.get(key)
+    if channel_id:
+        metrics.incr("channel_cache.memory_hit")
+        return channel_id
 
+    try:
+        channel_id = await get_channel_alias(key)
+    except Exception as e:
+        logger.warning("Channel alias lookup failed: %s", e)
+        channel_id = None
+
+    if channel_id:
+        metrics.incr("channel_cache.mongo_hit")
+        _channel_cache.set(key, channel_id)
+        return channel_id
+
+    metrics.incr("channel_cache.miss")
+
+    reference = parse_channel_reference(channel_query)
+    if reference:
+        kind, value = reference
+        channel_id = await lookup_channel(kind, value)
+        if channel_id:
+            metrics.incr(f"channel_resolve.{kind}")
+        else:
+            metrics.incr(f"channel_resolve.{kind}_not_found")
+
+    if not channel_id:
+        metrics.incr("channel_resolve.search")
+        channel_id = await search_channel(channel_query)
+
+    _channel_cache.set(key, channel_id)
+    try:
+        await save_channel_alias(key, channel_id, settings.channel_cache_ttl_seconds)
+    except Exception as e:
+        logger.warning("Failed to store channel alias: %s", e)
+
+    return channel_id
+
+
+async def search_channel(channel_query: str) -> str:
+    """
+    Resolves a channel query through the /search endpoint (100 quota units).
+    """
     params = {
         "part": "snippet",
         "q": channel_query,
         "type": "channel",
         "maxResults": 1,
-        "key": settings.youtube_api_key,
     }
 
-    resp = await client.get("/search", params=params)
-    resp.raise_for_status()
-    data = resp.json()
+    data = await api_get("/search", params=params, new_work=True)
 
     if not data.get("items"):
         raise ValueError("Channel not found")
@@ -49,34 +334,27 @@ async def fetch_latest_videos(
     """
     Fetch latest videos with statistics for a channel.
     """
-    client = get_http_client()
-
     # Get uploads playlist
-    resp = await client.get(
+    data = await api_get(
         "/channels",
         params={
             "part": "contentDetails",
             "id": channel_id,
-            "key": settings.youtube_api_key,
         },
     )
-    resp.raise_for_status()
-    data = resp.json()
 
     uploads_playlist = data["items"][0]["contentDetails"]["relatedPlaylists"]["uploads"]
 
     # Get playlist videos
-    resp = await client.get(
+    data = await api_get(
         "/playlistItems",
         params={
             "part": "snippet,contentDetails",
             "playlistId": uploads_playlist,
             "maxResults": max_results,
-            "key": settings.youtube_api_key,
         },
     )
-    resp.raise_for_status()
-    items = resp.json().get("items", [])
+    items = data.get("items", [])
 
     video_ids = [
         item["contentDetails"]["videoId"]
@@ -86,20 +364,8 @@ async def fetch_latest_videos(
     if not video_ids:
         return []
 
-    # Fetch video statistics
-    resp = await client.get(
-        "/videos",
-        params={
-            "part": "statistics",
-            "id": ",".join(video_ids),
-            "key": settings.youtube_api_key,
-        },
-    )
-    resp.raise_for_status()
-    stats_map = {
-        v["id"]: v["statistics"]
-        for v in resp.json().get("items", [])
-    }
+    # Fetch video statistics (batched with other in-flight jobs)
+    stats_map = await _stats_batcher.get(video_ids)
 
     # Combine results
     videos = []
@@ -76,7 +76,7 @@ async def get_current_user(request: Request):
 
     try:
         user = await mongodb.get_db()[USER_COLLECTION].find_one(
-            {"_id": ObjectId(user_id_str)}
+            {"_id": ObjectId(user_id_str)}, mongodb.USER_PROJECTION
         )
     except InvalidId:
         raise HTTPException(
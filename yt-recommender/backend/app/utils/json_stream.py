@@ -0,0 +1,86 @@
+import json
+from typing import Any, List, Optional, Tuple
+
+
+class JSONObjectStreamParser:
+    """
+    Incrementally scans a JSON document as it streams in and returns each
+    member of a top-level object (e.g. every service inside "services") as
+    soon as its value is complete.
+
+    Text before the root object (such as a markdown code fence) is ignored.
+    """
+
+    def __init__(self, container_key: str):
+        self.container_key = container_key
+        self._buffer = ""
+        self._pos = 0
+        self._stack: List[str] = []        # open containers: "{" or "["
+        self._keys: List[Optional[str]] = []  # current member key per object level
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._value_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Add a chunk of text and return the (key, value) pairs of container
+        members completed by it. Malformed members are skipped.
+        """
+        self._buffer += chunk
+        completed = []
+
+        while self._pos < len(self._buffer):
+            i = self._pos
+            char = self._buffer[i]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = _loads(self._buffer[self._string_start:i + 1])
+                continue
+
+            if not self._stack and char != "{":
+                continue  # preamble before the root object
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char == ":":
+                self._keys[-1] = self._last_string
+            elif char in "{[":
+                if self._in_container() and self._value_start is None:
+                    self._value_start = i
+                self._stack.append(char)
+                self._keys.append(None)
+            elif char in "}]":
+                self._stack.pop()
+                self._keys.pop()
+                if self._in_container() and self._value_start is not None:
+                    value = _loads(self._buffer[self._value_start:i + 1])
+                    if value is not None:
+                        completed.append((self._keys[-1], value))
+                    self._value_start = None
+
+        return completed
+
+    def _in_container(self) -> bool:
+        """True if the innermost open container is the tracked object."""
+        return (
+            len(self._stack) == 2
+            and self._stack[1] == "{"
+            and self._keys[0] == self.container_key
+        )
+
+
+def _loads(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return None
@@ -40,7 +40,7 @@ class SessionManager:
         # Check if user still exists in database
         try:
             user = await mongodb.get_db()[USER_COLLECTION].find_one(
-                {"_id": ObjectId(user_id)}
+                {"_id": ObjectId(user_id)}, {"is_active": 1}
             )
             return user is not None and user.get("is_active", True)
         except Exception:
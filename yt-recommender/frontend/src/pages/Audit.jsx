@@ -1,5 +1,5 @@
 import { useState } from 'react';
-import { submitAudit, getJobStatus } from '../services/api';
+import { submitAudit, getJobStatus, getJobSummary } from '../services/api';
 import { useReports } from '../context/ReportsContext';
 import { useNavigate } from 'react-router-dom';
 import {
@@ -119,9 +119,10 @@ const Audit = () => {
 
     const poll = async () => {
       try {
-        const result = await getJobStatus(jobId);
+        const summary = await getJobSummary(jobId);
 
-        if (result.status === 'completed') {
+        if (summary.status === 'completed') {
+          const result = await getJobStatus(jobId);
           addReport({
             id: result.jobId,
             jobId: result.jobId,
@@ -137,8 +138,8 @@ const Audit = () => {
 
           setStep('complete');
           return;
-        } else if (result.status === 'failed') {
-          setError(result.error || 'Job processing failed');
+        } else if (summary.status === 'failed') {
+          setError(summary.error || 'Job processing failed');
           setStep('error');
           return;
         }
@@ -72,4 +72,10 @@ export const getJobStatus = async (jobId) => {
   return response.data;
 };
 
+// Lightweight status for polling (no videos / report)
+export const getJobSummary = async (jobId) => {
+  const response = await axios.get(`${API_BASE_URL}/job/${jobId}/status`);
+  return response.data;
+};
+
 export default api;